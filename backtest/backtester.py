@@ -0,0 +1,224 @@
+# backtest/backtester.py - Replay de klines históricos pelas regras de sinal do robô.
+#
+#   python -m backtest.backtester dados/BTCUSDT_5m.csv dados/ETHUSDT_5m.parquet --estrategia macd
+
+import argparse
+import heapq
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from technical.indicators import indicadores_batch
+from technical.signals import sinais_macd, sinais_indicadores
+
+KLINE_COLUMNS = ["open_time", "open", "high", "low", "close", "volume", "close_time",
+                 "quote_volume", "trades", "taker_base", "taker_quote", "ignore"]
+
+
+def carregar_klines(path):
+    # CSV/Parquet com cabeçalho (open_time, open, high, low, close, ...) ou CSV cru da Binance (12 colunas)
+    if path.endswith(".parquet"):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path)
+        if "open_time" not in df.columns:
+            df = pd.read_csv(path, header=None, names=KLINE_COLUMNS[:len(df.columns)])
+    df = df[["open_time", "open", "high", "low", "close", "volume"]]
+    if not np.issubdtype(df["open_time"].dtype, np.number):
+        df["open_time"] = pd.to_datetime(df["open_time"]).astype("int64") // 1_000_000
+    return df.sort_values("open_time").drop_duplicates("open_time").reset_index(drop=True)
+
+
+def alinhar(dados):
+    # dict symbol -> DataFrame  =>  matrizes (n_símbolos x n_candles) na mesma grade de open_time.
+    # Antes da listagem de um símbolo os valores ficam NaN (sem sinal, sem ordem).
+    times = np.unique(np.concatenate([df["open_time"].to_numpy() for df in dados.values()]))
+    matrizes = {}
+    for campo in ("open", "high", "low", "close"):
+        m = np.full((len(dados), len(times)), np.nan)
+        for i, df in enumerate(dados.values()):
+            idx = np.searchsorted(times, df["open_time"].to_numpy())
+            m[i, idx] = df[campo].to_numpy()
+        matrizes[campo] = pd.DataFrame(m.T).ffill().to_numpy().T
+    return list(dados), times, matrizes
+
+
+def floor_step(quantidade, step):
+    return math.floor(quantidade / step + 1e-9) * step
+
+
+BLOCO_STOP = 256
+
+
+def simular(precos, compra, venda, capital=1000.0, taxa=0.001, step_size=1e-8, min_notional=5.0,
+            stop_loss=None, n_alocacao=None):
+    # Mesma execução do motor: na compra usa saldo_usdt / (n_símbolos * preço), com o saldo do início
+    # do tick, arredondado ao LOT_SIZE e só se passar do MIN_NOTIONAL; na venda zera a posição.
+    # O sinal do candle i é executado na abertura do candle i+1. Com stop_loss a posição sai quando
+    # a mínima fura preço_médio * (1 - stop).
+    opens, lows, closes = precos["open"], precos["low"], precos["close"]
+    n_sym, n = closes.shape
+    step = np.broadcast_to(np.asarray(step_size, dtype=float), (n_sym,)).tolist()
+    minimo = np.broadcast_to(np.asarray(min_notional, dtype=float), (n_sym,)).tolist()
+    n_alocacao = n_alocacao or n_sym
+    compra = compra & ~np.isnan(closes)
+    venda = venda & ~np.isnan(closes)
+    compra[:, -1] = venda[:, -1] = False
+
+    # Mínima de cada bloco de candles: acha o próximo stop sem varrer a série inteira
+    n_blocos = -(-n // BLOCO_STOP)
+    minimas = np.pad(lows, ((0, 0), (0, n_blocos * BLOCO_STOP - n)), constant_values=np.inf)
+    minimas = minimas.reshape(n_sym, n_blocos, BLOCO_STOP).min(axis=2)
+
+    caixa = capital
+    posicao = [0.0] * n_sym
+    preco_medio = [0.0] * n_sym
+    stops = []
+    versao = [0] * n_sym
+    delta_pos = np.zeros((n_sym, n))
+    delta_caixa = np.zeros(n)
+    trades = []
+
+    def primeiro(mascara):
+        if not len(mascara):
+            return -1
+        k = mascara.argmax()
+        return k if mascara[k] else -1
+
+    def agendar_stop(s, de):
+        nivel = preco_medio[s] * (1 - stop_loss)
+        b = de // BLOCO_STOP
+        k = primeiro(lows[s, de:(b + 1) * BLOCO_STOP] <= nivel)
+        if k < 0:
+            bloco = primeiro(minimas[s, b + 1:] <= nivel)
+            if bloco < 0:
+                return
+            de = (b + 1 + bloco) * BLOCO_STOP
+            k = primeiro(lows[s, de:de + BLOCO_STOP] <= nivel)
+        versao[s] += 1
+        heapq.heappush(stops, (int(de + k), s, versao[s]))
+
+    def executar_stops(ate):
+        nonlocal caixa
+        while stops and stops[0][0] <= ate:
+            k, s, v = heapq.heappop(stops)
+            if v != versao[s] or posicao[s] <= 0:
+                continue
+            preco = min(opens[s, k], preco_medio[s] * (1 - stop_loss))
+            bruto = posicao[s] * preco
+            caixa += bruto * (1 - taxa)
+            delta_caixa[k] += bruto * (1 - taxa)
+            delta_pos[s, k] -= posicao[s]
+            trades.append((k, s, "STOP", preco, posicao[s], bruto * taxa, bruto * (1 - taxa) - posicao[s] * preco_medio[s]))
+            posicao[s] = 0.0
+
+    # Só os pares (candle, símbolo) com sinal são visitados.
+    ev_i, ev_s = np.nonzero((compra | venda).T)
+    ev_compra = compra[ev_s, ev_i].tolist()
+    ev_venda = venda[ev_s, ev_i].tolist()
+    ev_preco = opens[ev_s, np.minimum(ev_i + 1, n - 1)].tolist()
+    atual = -1
+    saldo = caixa
+    for i, s, c, v, preco in zip(ev_i.tolist(), ev_s.tolist(), ev_compra, ev_venda, ev_preco):
+        j = i + 1
+        if i != atual:
+            if stop_loss is not None:
+                executar_stops(i)
+            atual = i
+            saldo = caixa
+        if c:
+            qtd = floor_step(saldo / (n_alocacao * preco), step[s])
+            if qtd > 0 and qtd * preco >= minimo[s]:
+                custo = qtd * preco * (1 + taxa)
+                caixa -= custo
+                delta_caixa[j] -= custo
+                preco_medio[s] = (posicao[s] * preco_medio[s] + custo) / (posicao[s] + qtd)
+                posicao[s] += qtd
+                delta_pos[s, j] += qtd
+                trades.append((j, s, "COMPRA", preco, qtd, qtd * preco * taxa, 0.0))
+                if stop_loss is not None:
+                    agendar_stop(s, j)
+        if v:
+            qtd = floor_step(posicao[s], step[s])
+            if qtd > 0 and qtd * preco >= minimo[s]:
+                bruto = qtd * preco
+                caixa += bruto * (1 - taxa)
+                delta_caixa[j] += bruto * (1 - taxa)
+                trades.append((j, s, "VENDA", preco, qtd, bruto * taxa, bruto * (1 - taxa) - qtd * preco_medio[s]))
+                posicao[s] -= qtd
+                delta_pos[s, j] -= qtd
+
+    if stop_loss is not None:
+        executar_stops(n - 1)
+
+    posicoes = np.cumsum(delta_pos, axis=1)
+    equity = capital + np.cumsum(delta_caixa) + np.nansum(posicoes * closes, axis=0)
+    df_trades = pd.DataFrame(trades, columns=["candle", "symbol", "tipo", "preco", "qtd", "taxa", "resultado"])
+    return equity, df_trades
+
+
+def metricas(equity, trades, candles_por_ano=105_120):
+    retornos = np.diff(equity) / equity[:-1]
+    pico = np.maximum.accumulate(equity)
+    saidas = trades[trades["tipo"] != "COMPRA"]
+    desvio = retornos.std()
+    return {
+        "retorno_total": equity[-1] / equity[0] - 1,
+        "max_drawdown": ((equity - pico) / pico).min(),
+        "sharpe": retornos.mean() / desvio * np.sqrt(candles_por_ano) if desvio > 0 else 0.0,
+        "operacoes": len(trades),
+        "taxa_acerto": (saidas["resultado"] > 0).mean() if len(saidas) else 0.0,
+        "taxas": trades["taxa"].sum(),
+    }
+
+
+def backtest(dados, estrategia="macd", params=None, capital=1000.0, taxa=0.001, filtros=None,
+             stop_loss=None, candles_por_ano=105_120, alinhado=None):
+    # dados: dict symbol -> DataFrame de klines (ou `alinhado` já pronto, reaproveitado pelo otimizador)
+    params = params or {}
+    symbols, times, precos = alinhado or alinhar(dados)
+    closes = precos["close"]
+    if estrategia == "macd":
+        ind = indicadores_batch(closes, params.get("macd_fast", 12), params.get("macd_slow", 26), params.get("macd_signal", 9))
+        compra, venda = sinais_macd(closes, usar_ema_cross=params.get("usar_ema_cross", True), ind=ind)
+    else:
+        ind = indicadores_batch(closes, 12, 26, 9, params.get("ema_curto", 9), params.get("ema_longo", 21))
+        compra, venda = sinais_indicadores(closes, params.get("rsi_entrada", 30), params.get("rsi_saida", 70),
+                                           macd_confirma=params.get("macd_confirma", True), ind=ind)
+    filtros = filtros or {}
+    step = [float(filtros[s]["step_size"]) if s in filtros else 1e-8 for s in symbols]
+    minimo = [filtros[s]["min_notional"] if s in filtros else 5.0 for s in symbols]
+    equity, trades = simular(precos, compra, venda, capital, taxa, step, minimo, stop_loss)
+    trades["symbol"] = np.asarray(symbols, dtype=object)[trades["symbol"].to_numpy(dtype=int)] if len(trades) else trades["symbol"]
+    trades["open_time"] = times[trades["candle"].to_numpy(dtype=int)] if len(trades) else trades["candle"]
+    return {
+        "symbols": symbols,
+        "times": times,
+        "equity": equity,
+        "trades": trades,
+        "metricas": metricas(equity, trades, candles_por_ano),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest das estratégias do robô")
+    parser.add_argument("arquivos", nargs="+", help="CSV/Parquet de klines, um por símbolo (SYMBOL_intervalo.csv)")
+    parser.add_argument("--estrategia", choices=["macd", "indicadores"], default="macd")
+    parser.add_argument("--macd", type=int, nargs=3, default=[12, 26, 9], metavar=("FAST", "SLOW", "SIGNAL"))
+    parser.add_argument("--sem-ema-cross", action="store_true")
+    parser.add_argument("--stop-loss", type=float, default=None, help="fração, ex.: 0.05")
+    parser.add_argument("--capital", type=float, default=1000.0)
+    parser.add_argument("--taxa", type=float, default=0.001)
+    args = parser.parse_args()
+    dados = {os.path.basename(p).split("_")[0].split(".")[0]: carregar_klines(p) for p in args.arquivos}
+    params = {"macd_fast": args.macd[0], "macd_slow": args.macd[1], "macd_signal": args.macd[2],
+              "usar_ema_cross": not args.sem_ema_cross}
+    resultado = backtest(dados, args.estrategia, params, args.capital, args.taxa, stop_loss=args.stop_loss)
+    for nome, valor in resultado["metricas"].items():
+        print(f"{nome:>14}: {valor:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# backtest/optimizer.py - Busca em grade/aleatória dos parâmetros do painel usando o backtester.
+# As matrizes de preço ficam em memória compartilhada: os workers só recebem os parâmetros.
+#
+#   python -m backtest.optimizer dados/*_5m.csv --amostras 2000 --workers 8 --saida ranking.csv
+
+import argparse
+import itertools
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from backtest.backtester import alinhar, carregar_klines, metricas, simular
+from technical.indicators import EMA_batch
+from technical.signals import sinais_macd
+
+# Mesmos limites dos sliders de main.py
+ESPACO_PADRAO = {
+    "macd_fast": range(5, 21),
+    "macd_slow": range(15, 51),
+    "macd_signal": range(5, 21),
+    "stop_loss": [None] + [p / 100 for p in range(1, 21)],
+}
+
+_precos = None
+_memorias = []
+_emas = {}
+
+
+def gerar_parametros(espaco=None, amostras=None, semente=0):
+    espaco = espaco or ESPACO_PADRAO
+    chaves = list(espaco)
+    grade = [dict(zip(chaves, valores)) for valores in itertools.product(*(espaco[c] for c in chaves))]
+    grade = [p for p in grade if p["macd_fast"] < p["macd_slow"]]
+    if amostras and amostras < len(grade):
+        grade = random.Random(semente).sample(grade, amostras)
+    return grade
+
+
+def compartilhar(precos):
+    # Copia cada matriz uma vez para um bloco de memória compartilhada e devolve os descritores
+    descritores, memorias = {}, []
+    for campo, matriz in precos.items():
+        matriz = np.ascontiguousarray(matriz, dtype=float)
+        shm = shared_memory.SharedMemory(create=True, size=matriz.nbytes)
+        np.ndarray(matriz.shape, dtype=matriz.dtype, buffer=shm.buf)[:] = matriz
+        descritores[campo] = (shm.name, matriz.shape, matriz.dtype.str)
+        memorias.append(shm)
+    return descritores, memorias
+
+
+def _anexar(descritores):
+    global _precos, _memorias
+    _precos, _memorias = {}, []
+    for campo, (nome, shape, dtype) in descritores.items():
+        shm = shared_memory.SharedMemory(name=nome)
+        matriz = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        matriz.flags.writeable = False
+        _precos[campo] = matriz
+        _memorias.append(shm)
+
+
+def _ema(period, closes):
+    # Cada worker guarda as EMAs já calculadas: o mesmo período aparece em muitas combinações
+    if period not in _emas:
+        _emas[period] = EMA_batch(closes, period)
+    return _emas[period]
+
+
+def _avaliar(macd, grupo, opcoes):
+    closes = _precos["close"]
+    fast, slow, signal = macd
+    macd_line = _ema(fast, closes) - _ema(slow, closes)
+    signal_line = EMA_batch(macd_line, signal)
+    ind = {"macd": macd_line, "signal": signal_line, "ema_curta": _ema(9, closes), "ema_longa": _ema(21, closes)}
+    compra, venda = sinais_macd(closes, usar_ema_cross=opcoes["usar_ema_cross"], ind=ind)
+    resultados = []
+    # Os sinais não dependem do stop: uma avaliação de indicadores serve para todos os stops do grupo
+    for params in grupo:
+        equity, trades = simular(_precos, compra, venda, opcoes["capital"], opcoes["taxa"],
+                                 opcoes["step"], opcoes["minimo"], params["stop_loss"])
+        resultados.append({**params, **metricas(equity, trades, opcoes["candles_por_ano"])})
+    return resultados
+
+
+def otimizar(dados, parametros, workers=None, ordenar="sharpe", capital=1000.0, taxa=0.001,
+             usar_ema_cross=True, filtros=None, candles_por_ano=105_120, progresso=None):
+    symbols, _, precos = alinhar(dados)
+    filtros = filtros or {}
+    opcoes = {
+        "capital": capital,
+        "taxa": taxa,
+        "usar_ema_cross": usar_ema_cross,
+        "step": [float(filtros[s]["step_size"]) if s in filtros else 1e-8 for s in symbols],
+        "minimo": [filtros[s]["min_notional"] if s in filtros else 5.0 for s in symbols],
+        "candles_por_ano": candles_por_ano,
+    }
+    grupos = {}
+    for params in parametros:
+        grupos.setdefault((params["macd_fast"], params["macd_slow"], params["macd_signal"]), []).append(params)
+    descritores, memorias = compartilhar(precos)
+    resultados = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_anexar, initargs=(descritores,)) as pool:
+            futures = [pool.submit(_avaliar, macd, grupo, opcoes) for macd, grupo in grupos.items()]
+            for n, future in enumerate(as_completed(futures), 1):
+                resultados.extend(future.result())
+                if progresso:
+                    progresso(n, len(futures))
+    finally:
+        for shm in memorias:
+            shm.close()
+            shm.unlink()
+    ranking = pd.DataFrame(resultados)
+    if ranking.empty:
+        return ranking
+    return ranking.sort_values(ordenar, ascending=False).reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Otimização dos parâmetros MACD/stop loss")
+    parser.add_argument("arquivos", nargs="+", help="CSV/Parquet de klines, um por símbolo (SYMBOL_intervalo.csv)")
+    parser.add_argument("--amostras", type=int, default=None, help="busca aleatória com N combinações (padrão: grade completa)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--ordenar", default="sharpe", choices=["sharpe", "retorno_total", "max_drawdown", "taxa_acerto"])
+    parser.add_argument("--sem-ema-cross", action="store_true")
+    parser.add_argument("--taxa", type=float, default=0.001)
+    parser.add_argument("--saida", default=None, help="grava o ranking completo em CSV")
+    parser.add_argument("--semente", type=int, default=0)
+    args = parser.parse_args()
+    dados = {os.path.basename(p).split("_")[0].split(".")[0]: carregar_klines(p) for p in args.arquivos}
+    parametros = gerar_parametros(amostras=args.amostras, semente=args.semente)
+    print(f"{len(parametros)} combinações em {args.workers} processos")
+    ranking = otimizar(dados, parametros, args.workers, args.ordenar, taxa=args.taxa,
+                       usar_ema_cross=not args.sem_ema_cross,
+                       progresso=lambda n, total: print(f"\r{n}/{total}", end="", flush=True))
+    print()
+    if args.saida:
+        ranking.to_csv(args.saida, index=False)
+    print(ranking.head(20).to_string())
+
+
+if __name__ == "__main__":
+    main()
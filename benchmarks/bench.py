@@ -0,0 +1,392 @@
+# benchmarks/bench.py - Tempos e conferência numérica dos indicadores, dos sinais e do tick completo.
+# Cada indicador é comparado com uma implementação de livro (laço Python, sem atalhos). Cada tempo é
+# dividido pelo de uma carga fixa medida logo antes na mesma execução (MACD/RSI antigos, que não mudam),
+# e essa razão é comparada com a de benchmarks/baseline.json (mediana de várias rodadas, com um limite
+# por caso acima do ruído medido entre elas). O script sai com código 1 se algo regredir.
+#
+#   python -m benchmarks.bench                          # confere e compara com a baseline
+#   python -m benchmarks.bench --salvar-baseline        # grava a mediana de 5 rodadas como referência
+#   python -m benchmarks.bench --max-pontos 100000 --symbols 50 --so batch
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from technical.indicators import (EMA, MACD, RSI, EMA_batch, EMAState, IndicatorCache, MACD_batch, MACDState,
+                                  RSI_batch, RSIState, indicadores_batch)
+from backtest.backtester import simular
+from technical.signals import sinal_indicadores, sinais_indicadores, sinais_macd
+from trading.strategies import criar_estrategias
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+TAMANHOS = [100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+# O RSI antigo é um laço Python: acima disso o benchmark leva minutos
+MAX_LEGADO_RSI = 1_000_000
+# Regressão mínima tolerada; a baseline grava um limite por caso acima do ruído medido
+LIMITE_PADRAO = 0.30
+# Folga absoluta: tempos de microssegundos oscilam mais que o limite entre execuções
+FOLGA_S = 0.0002
+TOLERANCIA = 1e-9
+
+
+def serie(n, semente=0):
+    rng = np.random.default_rng(semente)
+    return 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+
+
+# --- referências de livro ---
+
+def ema_ref(precos, period):
+    # EMA com alpha = 2/(n+1), iniciada no primeiro preço
+    alpha = 2. / (period + 1)
+    out, valor = [], None
+    for p in precos:
+        valor = p if valor is None else valor + alpha * (p - valor)
+        out.append(valor)
+    return np.array(out)
+
+
+def macd_ref(precos, fast=12, slow=26, signal=9):
+    macd = ema_ref(precos, fast) - ema_ref(precos, slow)
+    sinal = ema_ref(macd, signal)
+    return macd, sinal, macd - sinal
+
+
+def rsi_ref(precos, period=14):
+    # Wilder: médias simples dos primeiros `period` deltas, depois (média * (n-1) + delta) / n
+    out = [np.nan] * len(precos)
+    ganhos = [max(precos[i] - precos[i - 1], 0.) for i in range(1, len(precos))]
+    perdas = [max(precos[i - 1] - precos[i], 0.) for i in range(1, len(precos))]
+    if len(ganhos) < period:
+        return np.array(out)
+    media_g, media_p = sum(ganhos[:period]) / period, sum(perdas[:period]) / period
+    for i in range(period, len(precos)):
+        if i > period:
+            media_g = (media_g * (period - 1) + ganhos[i - 1]) / period
+            media_p = (media_p * (period - 1) + perdas[i - 1]) / period
+        out[i] = (100. if media_g > 0 else 50.) if media_p == 0 else 100. - 100. / (1. + media_g / media_p)
+    return np.array(out)
+
+
+def _erro(a, b):
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    if a.shape != b.shape or not np.array_equal(np.isnan(a), np.isnan(b)):
+        return np.inf
+    validos = ~np.isnan(a)
+    if not validos.any():
+        return 0.
+    return float(np.max(np.abs(a[validos] - b[validos]) / np.maximum(1., np.abs(b[validos]))))
+
+
+def conferir_resampler(passos=3_000, semente=0):
+    # Barras do Resampler (avançado em passos de relógio irregulares, com o candle de 1m em andamento) contra a
+    # agregação direta da série de 1m final, da barra da semeadura em diante (as anteriores vêm prontas da REST)
+    from market.klines import INTERVAL_MS, KlineStore
+    from market.resampler import Resampler, agregar
+    from market.simulator import Relogio, SimClient
+
+    symbol = "SIMUSDT"
+    relogio = Relogio(1_700_000_000_000 + 2_000, velocidade=0)
+    sim = SimClient(symbols=[symbol], relogio=relogio, limite_peso=None)
+    store = KlineStore(cache_dir=None, ttl=0)
+    resampler = Resampler(store, intervalos=("5m", "15m", "1h", "4h"))
+    semeado = relogio.agora()
+    resampler.semear(sim, symbol, semeado)
+    for passo in np.random.default_rng(semente).integers(1_000, 30_000, passos):
+        relogio.avancar(int(passo))
+        store.get(sim, symbol, "1m", 1_000, relogio.agora())
+        resampler.atualizar(symbol, relogio.agora())
+    base = store.series(symbol, "1m")
+    erro = 0.
+    for intervalo in resampler.intervalos:
+        dur = INTERVAL_MS[intervalo]
+        primeiro = max(-(-int(base["open_time"][0]) // dur) * dur, semeado // dur * dur)
+        direto = agregar(base[base["open_time"] >= primeiro], dur)
+        barras = store.series(symbol, intervalo)
+        barras = barras[barras["open_time"] >= primeiro]
+        if not len(direto) or not np.array_equal(barras["open_time"], direto["open_time"]):
+            return np.inf
+        erro = max([erro] + [_erro(barras[campo], direto[campo]) for campo in ("open", "high", "low", "close", "volume")])
+    return erro
+
+
+def conferir():
+    # (nome, erro relativo máximo, obrigatório)
+    resultados = []
+    casos = {"passeio": serie(5_000, 1), "alta": np.linspace(1, 50, 300), "constante": np.full(300, 7.)}
+    for caso, x in casos.items():
+        resultados.append((f"EMA_batch/{caso}", _erro(EMA_batch(x, 9)[0], ema_ref(x, 9)), True))
+        estado = EMAState(9)
+        resultados.append((f"EMAState/{caso}", _erro([estado.update(p) for p in x], ema_ref(x, 9)), True))
+        ref = macd_ref(x)
+        for nome, valor, esperado in zip(("macd", "signal", "hist"), MACD_batch(x), ref):
+            resultados.append((f"MACD_batch.{nome}/{caso}", _erro(valor[0], esperado), True))
+        estado = MACDState()
+        valores = np.array([estado.update(p) for p in x]).T
+        resultados.append((f"MACDState/{caso}", max(_erro(v, e) for v, e in zip(valores, ref)), True))
+        resultados.append((f"RSI_batch/{caso}", _erro(RSI_batch(x, 14)[0], rsi_ref(x, 14)), True))
+        estado = RSIState(14)
+        valores = [estado.update(p) for p in x]
+        resultados.append((f"RSIState/{caso}", _erro([np.nan if v is None else v for v in valores], rsi_ref(x, 14)), True))
+
+    # O motor: estado incremental (candles fechados + o aberto via peek) contra o lote,
+    # passando por snapshot()/restore() em JSON no meio, como numa volta do motor (que depois só vê 100 candles)
+    x = casos["passeio"]
+    t = np.arange(len(x))
+    indicadores = [("macd", 12, 26, 9), ("ema", 9), ("ema", 21), ("rsi", 14)]
+    cache = IndicatorCache()
+    cache.valores("X", "1m", x[:-50], t[:-50], indicadores)
+    cache = IndicatorCache.restore(json.loads(json.dumps(cache.snapshot())))
+    valores = cache.valores("X", "1m", x[-100:], t[-100:], indicadores)
+    ind = indicadores_batch(x)
+    erros = []
+    for posicao, idx in ((0, -2), (1, -1)):
+        (macd, signal, _), ema9, ema21, rsi = (valores[k][posicao] for k in indicadores)
+        erros += [_erro(macd, ind["macd"][0, idx]), _erro(signal, ind["signal"][0, idx]), _erro(ema9, ind["ema_curta"][0, idx]),
+                  _erro(ema21, ind["ema_longa"][0, idx]), _erro(rsi, ind["rsi"][0, idx])]
+    resultados.append(("IndicatorCache.restore", max(erros), True))
+    matriz = np.array([serie(1_000, s) for s in range(8)])
+    ind = indicadores_batch(matriz)
+    resultados.append(("indicadores_batch/matriz", max(_erro(ind[k][i], indicadores_batch(matriz[i])[k][0])
+                                                       for k in ind for i in range(len(matriz))), True))
+
+    # Stop-loss de uma compra no último bloco de candles do backtester: furado no candle 290 e nunca furado
+    n = 300
+    precos = {k: np.full((1, n), 100.) for k in ("open", "high", "low", "close")}
+    compra, venda = np.zeros((1, n), dtype=bool), np.zeros((1, n), dtype=bool)
+    compra[0, 270] = True
+    for caso, fura in (("furado", 290), ("nao_furado", None)):
+        lows = precos["low"] = np.full((1, n), 100.)
+        if fura:
+            lows[0, fura] = 90.
+        _, trades = simular(precos, compra.copy(), venda.copy(), stop_loss=0.05)
+        stops = trades.loc[trades["tipo"] == "STOP", "candle"].tolist()
+        resultados.append((f"simular.stop_ultimo_bloco/{caso}", float(stops != ([fura] if fura else [])), True))
+
+    resultados.append(("Resampler/3000_passos", conferir_resampler(), True))
+
+    # Um símbolo por vez (main1.py, estados incrementais) contra a última coluna do lote, em janelas de 100 candles
+    x = casos["passeio"]
+    janelas = np.array([x[i - 100:i] for i in range(100, len(x), 5)])
+    divergencias = 0
+    for params in ((30, 70, 9, 21, True), (45, 55, 9, 21, False), (50, 50, 9, 21, True), (48, 52, 5, 30, True)):
+        compra, venda = sinais_indicadores(janelas, *params)
+        unicos = [sinal_indicadores(j, *params) for j in janelas]
+        divergencias += sum((c, v) != (bool(compra[i, -1]), bool(venda[i, -1])) for i, (c, v) in enumerate(unicos))
+    resultados.append(("sinal_indicadores/janelas", float(divergencias), True))
+
+    # Versões antigas (main.py/main1.py originais): não seguem a fórmula de livro, só informativo
+    resultados.append(("EMA legado/passeio", _erro(EMA(x, 9), ema_ref(x, 9)), False))
+    resultados.append(("MACD legado/passeio", _erro(MACD(x)[0], macd_ref(x)[0]), False))
+    resultados.append(("RSI legado/passeio", _erro(np.r_[[np.nan] * 14, RSI(x, 14)[14:]], rsi_ref(x, 14)), False))
+    return resultados
+
+
+# --- tempos ---
+
+def medir(func, orcamento=0.2, repeticoes=5):
+    # Melhor tempo por chamada entre `repeticoes` rodadas de N chamadas (N ajustado ao orçamento)
+    inicio = time.perf_counter()
+    func()
+    unico = time.perf_counter() - inicio
+    if unico * repeticoes > 5 * orcamento:
+        repeticoes = max(1, min(repeticoes, int(5 * orcamento / unico)))
+    chamadas = max(1, int(orcamento / repeticoes / max(unico, 1e-7)))
+    melhor = unico
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        for _ in range(chamadas):
+            func()
+        melhor = min(melhor, (time.perf_counter() - inicio) / chamadas)
+    return melhor
+
+
+_X_REFERENCIA = serie(10_000, 7)
+
+
+def carga_referencia():
+    # Carga fixa da mesma máquina: MACD antigo (numpy) + RSI antigo (laço Python)
+    MACD(_X_REFERENCIA)
+    RSI(_X_REFERENCIA[:1_000], 14)
+
+
+def _simulado(symbols, intervalo="15m"):
+    from engine import DEFAULT_CONFIG, Engine
+    from market.klines import INTERVAL_MS, KlineStore
+    from market.simulator import Relogio, SimClient
+    from trading.trade_store import TradeStore
+
+    dur = INTERVAL_MS[intervalo]
+    relogio = Relogio(int(time.time() * 1000) // dur * dur + 2000, velocidade=0)
+    sim = SimClient(symbols=symbols, relogio=relogio, saldos={"USDT": 1_000_000.0}, limite_peso=None)
+    tmp = tempfile.mkdtemp()
+    engine = Engine(sim, store=KlineStore(cache_dir=None, max_series=len(symbols) + 10, ttl=0),
+                    trades=TradeStore(os.path.join(tmp, "operacoes.db")))
+    engine.exchange_info.refresh()
+    cfg = {**DEFAULT_CONFIG, "symbols": symbols, "intervalo": intervalo, "usar_websocket": False, "timeout_symbol": 600}
+    return engine, cfg, relogio, dur
+
+
+def benchmarks(max_pontos, n_symbols):
+    casos = {}
+    for n in (t for t in TAMANHOS if t <= max_pontos):
+        x = serie(n)
+        casos[f"ema_batch/{n}"] = lambda x=x: EMA_batch(x, 21)
+        casos[f"macd_batch/{n}"] = lambda x=x: MACD_batch(x)
+        casos[f"rsi_batch/{n}"] = lambda x=x: RSI_batch(x, 14)
+        casos[f"ema_legado/{n}"] = lambda x=x: EMA(x, 21)
+        casos[f"macd_legado/{n}"] = lambda x=x: MACD(x)
+        if n <= MAX_LEGADO_RSI:
+            casos[f"rsi_legado/{n}"] = lambda x=x: RSI(x, 14)
+
+    x = serie(100_000).tolist()
+
+    def atualizar_ema():
+        estado = EMAState(21)
+        for p in x:
+            estado.update(p)
+
+    closes, times = np.array(x), np.arange(len(x))
+
+    def atualizar_indicadores():
+        IndicatorCache().valores("X", "1m", closes, times, [("macd", 12, 26, 9), ("ema", 9), ("ema", 21), ("rsi", 14)])
+    casos["ema_state/100000"] = atualizar_ema
+    casos["indicator_cache/100000"] = atualizar_indicadores
+
+    # Sinais: matriz de todos os símbolos (backtester) e um símbolo por vez com 100 candles (main1.py)
+    matriz = np.array([serie(1_000, s) for s in range(n_symbols)])
+    casos[f"sinais_macd/{n_symbols}x1000"] = lambda: sinais_macd(matriz)
+    casos[f"sinais_indicadores/{n_symbols}x1000"] = lambda: sinais_indicadores(matriz)
+    linhas = [m[-100:] for m in matriz]
+    casos[f"analisar_indicadores/{n_symbols}x100"] = lambda: [sinal_indicadores(c) for c in linhas]
+
+    # Motor com a corretora simulada (sem latência): um candle novo por chamada
+    symbols = [f"SIM{i:03d}USDT" for i in range(n_symbols)]
+    engine, cfg, relogio, dur = _simulado(symbols)
+    estrategia = criar_estrategias(cfg)[0]
+
+    def analisar():
+        relogio.avancar(dur)
+        for symbol in symbols:
+            engine.analisar(estrategia, symbol, relogio.agora())
+
+    def tick():
+        relogio.avancar(dur)
+        engine.executar_trade(cfg, relogio.agora())
+    casos[f"analisar_macd/{n_symbols}"] = analisar
+    casos[f"tick/{n_symbols}"] = tick
+    return casos, engine
+
+
+def ler_baseline(path):
+    # Baselines antigas (tempos absolutos, sem "referencia_s") não servem para a comparação por razão
+    try:
+        with open(path) as f:
+            baseline = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return baseline if "referencia_s" in baseline else None
+
+
+def medir_razao(func, refs, **kwargs):
+    # A referência é medida logo antes do caso, nas mesmas condições da máquina
+    ref = medir(carga_referencia, orcamento=0.05)
+    refs.append(ref)
+    tempo = medir(func, **kwargs)
+    return tempo, tempo / ref, FOLGA_S / ref
+
+
+def salvar_baseline(path, casos, rodadas, so=None):
+    # Mediana de várias rodadas; o limite de cada caso fica acima do ruído medido entre elas
+    # (o dobro da diferença entre a maior e a menor razão, no mínimo LIMITE_PADRAO)
+    razoes, tempos, refs = {}, {}, []
+    for rodada in range(rodadas):
+        print(f"rodada {rodada + 1}/{rodadas}", flush=True)
+        for nome, func in casos.items():
+            if so and so not in nome:
+                continue
+            tempo, razao, _ = medir_razao(func, refs)
+            razoes.setdefault(nome, []).append(razao)
+            tempos.setdefault(nome, []).append(tempo)
+    anterior = ler_baseline(path) or {}
+    resultados = {nome: float(np.median(r)) for nome, r in razoes.items()}
+    limites = {nome: round(max(LIMITE_PADRAO, 2 * (max(r) / min(r) - 1)), 2) for nome, r in razoes.items()}
+    with open(path, "w") as f:
+        json.dump({
+            "maquina": {"python": platform.python_version(), "numpy": np.__version__, "sistema": platform.platform(),
+                        "processador": platform.processor() or platform.machine(), "cpus": os.cpu_count()},
+            "rodadas": rodadas,
+            "referencia_s": float(np.median(refs)),
+            # razão tempo / referência (mediana das rodadas) e regressão tolerada por caso
+            "resultados": {**anterior.get("resultados", {}), **resultados},
+            "limites": {**anterior.get("limites", {}), **limites},
+            "tempos_s": {**anterior.get("tempos_s", {}), **{nome: float(np.median(t)) for nome, t in tempos.items()}},
+        }, f, indent=2, sort_keys=True)
+    for nome in resultados:
+        print(f"  {nome:<32}{resultados[nome]:>10.3f}  limite {limites[nome]:.2f}")
+    print(f"\nBaseline gravada em {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks e conferência dos indicadores")
+    parser.add_argument("--max-pontos", type=int, default=TAMANHOS[-1])
+    parser.add_argument("--symbols", type=int, default=100)
+    parser.add_argument("--so", default=None, help="só os benchmarks cujo nome contém o texto")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--salvar-baseline", action="store_true")
+    parser.add_argument("--rodadas", type=int, default=5, help="rodadas medidas ao gravar a baseline")
+    parser.add_argument("--limite", type=float, default=None, help="regressão tolerada (padrão: a de cada caso na baseline)")
+    args = parser.parse_args()
+    falhou = False
+
+    print("Conferência com as fórmulas de livro")
+    for nome, erro, obrigatorio in conferir():
+        ok = erro <= TOLERANCIA
+        falhou |= obrigatorio and not ok
+        status = "ok" if ok else ("FALHOU" if obrigatorio else "difere (informativo)")
+        print(f"  {nome:<32} erro={erro:<10.3g} {status}")
+
+    casos, engine = benchmarks(args.max_pontos, args.symbols)
+    try:
+        if args.salvar_baseline:
+            salvar_baseline(args.baseline, casos, args.rodadas, args.so)
+            sys.exit(1 if falhou else 0)
+        baseline = ler_baseline(args.baseline) or {}
+        referencia = baseline.get("resultados", {})
+        refs = []
+        print(f"\n{'benchmark':<34}{'tempo':>12}{'x ref':>10}{'baseline':>10}{'variação':>10}{'limite':>8}")
+        for nome, func in casos.items():
+            if args.so and args.so not in nome:
+                continue
+            limite = args.limite if args.limite is not None else baseline.get("limites", {}).get(nome, LIMITE_PADRAO)
+            tempo, razao, folga = medir_razao(func, refs)
+            if nome in referencia and razao > referencia[nome] * (1 + limite) + folga:
+                # Confirma com uma medição mais longa antes de acusar (ruído da máquina)
+                tempo, razao, folga = min((tempo, razao, folga), medir_razao(func, refs, orcamento=1.0, repeticoes=7),
+                                          key=lambda r: r[1])
+            linha = f"  {nome:<32}{tempo * 1000:>10.3f}ms{razao:>10.3f}"
+            if nome in referencia:
+                regrediu = razao > referencia[nome] * (1 + limite) + folga
+                falhou |= regrediu
+                linha += (f"{referencia[nome]:>10.3f}{razao / referencia[nome]:>10.2f}{1 + limite:>7.2f}x"
+                          + ("  REGRESSÃO" if regrediu else ""))
+            print(linha, flush=True)
+        if refs:
+            print(f"\nreferência (MACD/RSI antigos): {np.median(refs) * 1000:.3f}ms", end="")
+            print(f" (baseline: {baseline['referencia_s'] * 1000:.3f}ms)" if baseline else "")
+    finally:
+        if engine.pool:
+            engine.pool.shutdown()
+        shutil.rmtree(os.path.dirname(engine.trades.path), ignore_errors=True)
+    sys.exit(1 if falhou else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import io
+import threading
+from collections import OrderedDict
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from market.klines import INTERVAL_MS
+
+PERIODOS_MS = {
+    "1h": 3_600_000,
+    "24h": 86_400_000,
+    "5d": 5 * 86_400_000,
+    "30d": 30 * 86_400_000,
+    "1ano": 365 * 86_400_000,
+}
+
+# Candles extras antes da janela exibida, para as EMAs/MACD já estarem aquecidas
+AQUECIMENTO = 100
+MAX_CANDLES = 1000
+
+
+def intervalo_grafico(periodo, intervalo):
+    # O menor intervalo (a partir do de análise) que cobre o período com no máximo MAX_CANDLES candles
+    for candidato in (intervalo, "1h", "4h", "1d"):
+        if INTERVAL_MS[candidato] >= INTERVAL_MS[intervalo] and PERIODOS_MS[periodo] // INTERVAL_MS[candidato] + AQUECIMENTO <= MAX_CANDLES:
+            return candidato
+    return "1d"
+
+
+def candles_grafico(periodo, intervalo):
+    return min(PERIODOS_MS[periodo] // INTERVAL_MS[intervalo] + AQUECIMENTO, MAX_CANDLES)
+
+
+def janela(times, periodo, max_pontos=300):
+    # Índices dos pontos exibidos: só o período escolhido, reduzido a no máximo `max_pontos` (sempre com o último)
+    inicio = times[-1] - np.timedelta64(PERIODOS_MS[periodo], "ms")
+    idx = np.flatnonzero(times >= inicio)
+    if len(idx) > max_pontos:
+        passo = -(-len(idx) // max_pontos)
+        idx = idx[::-1][::passo][::-1]
+    return idx
+
+
+class ChartCache:
+    # Gráficos já renderizados (PNG) por chave; a figura é fechada logo após o render.
+    def __init__(self, max_itens=200, dpi=100):
+        self.max_itens = max_itens
+        self.dpi = dpi
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.renders = 0
+
+    def render(self, chave, desenhar):
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self.hits += 1
+                return self._itens[chave]
+        fig = desenhar()
+        buf = io.BytesIO()
+        try:
+            fig.savefig(buf, format="png", dpi=self.dpi, bbox_inches="tight")
+        finally:
+            plt.close(fig)
+        png = buf.getvalue()
+        with self._lock:
+            self.renders += 1
+            self._itens[chave] = png
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+        return png
+
+
+def fig_medias(symbol, times, ema9, ema21):
+    fig, ax = plt.subplots()
+    ax.plot(times, ema9, linestyle='-', alpha=0.6, label='EMA 9')
+    ax.plot(times, ema21, linestyle='-', alpha=0.6, label='EMA 21')
+    ax.set_xlabel('Data/Hora')
+    ax.set_ylabel('Médias Móveis')
+    ax.set_title(f'{symbol} - EMA 9 e EMA 21')
+    ax.legend()
+    fig.autofmt_xdate()
+    return fig
+
+
+def fig_macd(symbol, times, macd_line, signal_line):
+    fig, ax = plt.subplots()
+    ax.plot(times, macd_line, linestyle='--', label='MACD')
+    ax.plot(times, signal_line, linestyle=':', label='Signal')
+    ax.set_xlabel('Data/Hora')
+    ax.set_ylabel('MACD e Signal')
+    ax.set_title(f'{symbol} - MACD vs Signal')
+    ax.legend()
+    fig.autofmt_xdate()
+    return fig
+
+
+def fig_lucro(df_trades):
+    fig, ax = plt.subplots()
+    ax.bar(df_trades['Data Venda'], df_trades['Lucro/Prejuízo'], color=np.where(df_trades['Lucro/Prejuízo'] >= 0, 'green', 'red'))
+    ax.set_xlabel('Data da Venda')
+    ax.set_ylabel('Lucro/Prejuízo (USDT)')
+    ax.set_title('Lucro/Prejuízo por Operação')
+    fig.autofmt_xdate()
+    return fig
+
+
+def fig_saldo_diario(saldo_diario):
+    fig, ax = plt.subplots()
+    ax.plot(saldo_diario['Dia'], saldo_diario['Lucro'], marker='o')
+    ax.set_xlabel('Dia')
+    ax.set_ylabel('Lucro Acumulado (USDT)')
+    ax.set_title('Evolução do Saldo Diário')
+    fig.autofmt_xdate()
+    return fig
@@ -0,0 +1,492 @@
+# engine.py - Motor de trading headless: avalia a estratégia no fechamento de cada candle.
+# O painel (main.py) só grava a configuração em config_robo.json e lê o estado em estado_robo.json.
+#
+#   python engine.py
+
+import copy
+import fcntl
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+
+from apscheduler.schedulers.blocking import BlockingScheduler
+from dotenv import load_dotenv
+from twilio.rest import Client as TwilioClient
+
+from market.exchange_info import ExchangeInfo
+from market.klines import KlineStore, INTERVAL_MS, MAX_LIMIT
+from market.portfolio import Portfolio
+from market.resampler import BASE, Resampler
+from market.gateway import Gateway
+from market.simulator import criar_client
+from market.stream import MarketStream
+from monitor.metrics import ClienteMedido, Metrics, servir
+from technical.indicators import IndicatorCache
+from trading.alerts import AlertDispatcher, LocalSink, twilio_sink
+from trading.strategies import CONTA_PRINCIPAL, criar_estrategias
+from trading.trade_store import abrir_trade_store, execucao
+
+CONFIG_FILE = "config_robo.json"
+STATE_FILE = "estado_robo.json"
+# Estados dos indicadores: na volta do motor os candles já consumidos não são reprocessados
+INDICADORES_FILE = "indicadores_robo.json"
+LOCK_FILE = "engine.lock"
+
+DEFAULT_CONFIG = {
+    "trading_ativo": True,
+    "symbols": ["BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT", "ADAUSDT"],
+    "intervalo": "15m",
+    "macd_fast": 12,
+    "macd_slow": 26,
+    "macd_signal": 9,
+    "usar_ema_cross": True,
+    "usar_websocket": True,
+    "max_workers": 8,
+    "timeout_symbol": 20,
+    "metricas": False,
+    # Intervalos maiores que confirmam o sinal (MACD acima/abaixo da signal na última barra fechada).
+    # Com algum definido, todos os intervalos são montados a partir da série de 1m.
+    "timeframes": [],
+    # Estratégias além da do painel (ver trading/strategies.py); contas além da principal leem
+    # BINANCE_API_KEY_<CONTA>/BINANCE_API_SECRET_<CONTA> do ambiente.
+    "estrategias": [],
+}
+
+log = logging.getLogger("engine")
+
+
+def salvar_json(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, default=str)
+    os.replace(tmp, path)
+
+
+def ler_json(path, default=None):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def ler_config():
+    return {**DEFAULT_CONFIG, **(ler_json(CONFIG_FILE) or {})}
+
+
+def ler_estado():
+    return ler_json(STATE_FILE)
+
+
+def ler_indicadores():
+    # Arquivo ausente ou de outro formato: os indicadores recomeçam das klines
+    try:
+        return IndicatorCache.restore(ler_json(INDICADORES_FILE) or [])
+    except (KeyError, ValueError, TypeError):
+        return IndicatorCache()
+
+
+def candle_fechou(intervalo, agora_ms):
+    # O job roda todo minuto; só avalia quando o minuto corrente abre um candle novo do intervalo.
+    return (agora_ms // 60_000 * 60_000) % INTERVAL_MS[intervalo] == 0
+
+
+def modo_derivado(estrategias):
+    # Mais de um intervalo em uso (entre estratégias ou timeframes de confirmação): todos saem da série de 1m
+    intervalos = {e.intervalo for e in estrategias} | {t for e in estrategias for t in e.timeframes}
+    return len(intervalos) > 1 or any(e.timeframes for e in estrategias)
+
+
+def adquirir_lock(path=LOCK_FILE):
+    # Uma única instância do motor por máquina: evita ordens duplicadas.
+    f = open(path, "w")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    f.write(str(os.getpid()))
+    f.flush()
+    return f
+
+
+class Conta:
+    # Credenciais de uma conta: saldos e ordens. Dados de mercado e exchangeInfo vêm do client principal.
+    def __init__(self, nome, client):
+        self.nome = nome
+        self.client = client
+        self.portfolio = Portfolio(client)
+
+
+class Engine:
+    def __init__(self, client, store=None, twilio=None, twilio_number=None, dest_number=None, exchange_info=None,
+                 trades=None, alertas=None, metricas=None, criar_conta=None, indicadores=None):
+        self.metricas = metricas or Metrics(ativo=False)
+        self.client = client = ClienteMedido(client, self.metricas)
+        self.trades = trades or abrir_trade_store()
+        self.store = store or KlineStore()
+        self.exchange_info = exchange_info or ExchangeInfo(client)
+        self.contas = {CONTA_PRINCIPAL: Conta(CONTA_PRINCIPAL, client)}
+        self.portfolio = self.contas[CONTA_PRINCIPAL].portfolio
+        # nome da conta -> client com as credenciais dela (main() lê do ambiente)
+        self.criar_conta = criar_conta
+        # Alertas saem por uma fila em segundo plano: a ordem não espera o envio
+        if alertas is None and twilio:
+            alertas = AlertDispatcher(twilio_sink(twilio, f'whatsapp:{twilio_number}', f'whatsapp:{dest_number}'))
+        self.alertas = alertas
+        self.stream = None
+        self.pool = None
+        self.pool_workers = None
+        # symbol -> future ainda rodando (inclusive os que passaram do timeout do tick)
+        self.em_andamento = {}
+        self._lock = threading.Lock()
+        self.resampler = Resampler(self.store)
+        self.base_em = {}
+        self.derivado = False
+        self.indicadores = indicadores or IndicatorCache()
+        self.estado = {"inicio": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "sinais": {}, "erros": [], "operacoes": []}
+
+    def conta(self, nome):
+        with self._lock:
+            if nome not in self.contas:
+                if self.criar_conta is None:
+                    raise KeyError(f"Conta sem credenciais: {nome}")
+                self.contas[nome] = Conta(nome, ClienteMedido(self.criar_conta(nome), self.metricas))
+            return self.contas[nome]
+
+    def atualizar_stream(self, cfg, estrategias):
+        if not cfg["usar_websocket"] or not estrategias:
+            if self.stream:
+                self.stream.stop()
+                self.stream = None
+            return
+        # Um stream só para todas as estratégias: a união dos símbolos
+        symbols = list(dict.fromkeys(s for e in estrategias for s in e.symbols))
+        intervalo = BASE if self.derivado else estrategias[0].intervalo
+        if self.stream and self.stream.symbols == symbols and self.stream.interval == intervalo:
+            return
+        if self.stream:
+            self.stream.stop()
+        self.stream = MarketStream(symbols, intervalo, self.store)
+        if intervalo == BASE:
+            self.stream.on_kline(lambda symbol, *_: self.resampler.atualizar(symbol, int(time.time() * 1000)))
+        self.stream.warm(self.client, MAX_LIMIT if intervalo == BASE else 100)
+        self.stream.start()
+
+    def get_klines(self, symbol, intervalo, limit=100, agora_ms=None):
+        with self.metricas.span("klines"):
+            if self.derivado:
+                return self.klines_derivados(symbol, intervalo, limit, agora_ms or int(time.time() * 1000))
+            series = self.stream.klines(symbol, limit) if self.stream else None
+            if series is None:
+                series = self.store.get(self.client, symbol, intervalo, limit, agora_ms)
+        return series
+
+    def klines_derivados(self, symbol, intervalo, limit, agora_ms):
+        # Uma única série de 1m por símbolo (stream ou REST incremental, uma vez por tick) alimenta todos os intervalos
+        if not (self.stream and self.stream.fresh(symbol)) and self.base_em.get(symbol) != agora_ms:
+            self.store.get(self.client, symbol, BASE, MAX_LIMIT, agora_ms)
+            self.base_em[symbol] = agora_ms
+        if not self.resampler.semeado(symbol):
+            self.resampler.semear(self.client, symbol, agora_ms, limit)
+        self.resampler.atualizar(symbol, agora_ms)
+        series = self.store.series(symbol, intervalo)
+        return series[-limit:] if series is not None else self.store.get(self.client, symbol, intervalo, limit, agora_ms)
+
+    def valores(self, symbol, intervalo, indicadores, agora_ms):
+        series = self.get_klines(symbol, intervalo, agora_ms=agora_ms)
+        # Só candles fechados: o cruzamento é avaliado entre os dois últimos fechamentos.
+        fechados = series[series["close_time"] < agora_ms]
+        if len(fechados) < 3:
+            return None
+        closes, times = fechados["close"], fechados["open_time"]
+        with self.metricas.span("indicadores"):
+            valores = self.indicadores.valores(symbol, intervalo, closes, times, indicadores)
+        return closes, times, valores
+
+    def confirmar(self, estrategia, symbol, agora_ms):
+        # Tendência de cada timeframe de confirmação na última barra fechada
+        tendencias = {}
+        indicador = estrategia.tendencia()
+        for intervalo in estrategia.timeframes:
+            resultado = self.valores(symbol, intervalo, [indicador], agora_ms)
+            if resultado is None:
+                tendencias[intervalo] = None
+                continue
+            macd, signal, _ = resultado[2][indicador][1]
+            tendencias[intervalo] = "alta" if macd > signal else "baixa"
+        compra = all(t == "alta" for t in tendencias.values())
+        venda = all(t == "baixa" for t in tendencias.values())
+        return compra, venda, tendencias
+
+    def analisar(self, estrategia, symbol, agora_ms):
+        resultado = self.valores(symbol, estrategia.intervalo, estrategia.indicadores(), agora_ms)
+        if resultado is None:
+            return False, False, None
+        closes, times, valores = resultado
+        compra, venda, dados = estrategia.avaliar(valores)
+        sinal = {
+            "horario": datetime.fromtimestamp(int(times[-1]) / 1000).strftime("%Y-%m-%d %H:%M"),
+            "preco": float(closes[-1]),
+            **dados,
+            "compra": bool(compra),
+            "venda": bool(venda),
+        }
+        with self._lock:
+            self.estado["sinais"].setdefault(estrategia.nome, {})[symbol] = sinal
+        return bool(compra), bool(venda), float(closes[-1])
+
+    def registrar_operacao(self, horario, moeda, tipo, ordem, estrategia, conta):
+        # Preço médio, quantidade executada e comissões vêm da resposta da ordem, não do fechamento do candle
+        preco, qtd, taxa = execucao(ordem, self.exchange_info.get(moeda)["base_asset"],
+                                    lambda ativo: conta.portfolio.preco(f"{ativo}USDT"))
+        with self.metricas.span("registro"):
+            self.trades.registrar(horario, moeda, tipo, preco, qtd, taxa, estrategia=estrategia.nome,
+                                  params=estrategia.params, conta=conta.nome)
+        with self._lock:
+            self.estado["operacoes"] = (self.estado["operacoes"] + [[horario, moeda, tipo, preco, qtd, estrategia.nome]])[-20:]
+        return preco
+
+    def enviar_alerta(self, mensagem):
+        if self.alertas:
+            with self.metricas.span("alerta"):
+                self.alertas.alerta(mensagem)
+
+    def erro(self, mensagem):
+        log.warning(mensagem)
+        agora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            self.estado["erros"] = (self.estado["erros"] + [[agora, mensagem]])[-20:]
+
+    def get_pool(self, max_workers):
+        if self.pool is None or self.pool_workers != max_workers:
+            if self.pool:
+                self.pool.shutdown(wait=False)
+            self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="symbol")
+            self.pool_workers = max_workers
+        return self.pool
+
+    def processar_symbol(self, symbol, estrategias, cfg, agora_ms, saldos, vagas):
+        # Todas as estratégias do símbolo no mesmo worker: klines e indicadores saem dos caches compartilhados
+        resultados = {}
+        with self.metricas.span("symbol"):
+            for estrategia in estrategias:
+                try:
+                    resultados[estrategia.nome] = self._processar_symbol(
+                        estrategia, symbol, cfg, agora_ms, saldos[estrategia.conta], vagas[estrategia.conta])
+                except Exception as e:
+                    resultados[estrategia.nome] = "erro"
+                    self.erro(f"Erro ao processar {symbol} ({estrategia.nome}): {e}")
+        return resultados
+
+    def _processar_symbol(self, estrategia, symbol, cfg, agora_ms, saldo_usdt, vagas):
+        conta = self.conta(estrategia.conta)
+        base_asset = symbol.replace('USDT', '')
+        with self.metricas.span("saldo"):
+            saldo_asset = conta.portfolio.saldo(base_asset)
+        cond_compra, cond_venda, preco = self.analisar(estrategia, symbol, agora_ms)
+        if preco is None:
+            return None
+        confirma_compra, confirma_venda, tendencias = self.confirmar(estrategia, symbol, agora_ms)
+        if tendencias:
+            with self._lock:
+                self.estado["sinais"][estrategia.nome][symbol]["timeframes"] = tendencias
+        ativo = cfg["trading_ativo"] and estrategia.trading_ativo
+        with self.metricas.span("exchange_info"):
+            quantidade = self.exchange_info.ajustar_quantidade(symbol, saldo_usdt / (vagas * preco))
+            min_notional = self.exchange_info.min_notional(symbol)
+        agora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        if cond_compra and confirma_compra and ativo:
+            if quantidade * preco >= min_notional:
+                with self.metricas.span("ordem"):
+                    ordem = conta.client.order_market_buy(symbol=symbol, quantity=quantidade)
+                # As outras estratégias da conta já leem o saldo novo neste tick
+                conta.portfolio.invalidate()
+                preco = self.registrar_operacao(agora, symbol, "COMPRA", ordem, estrategia, conta)
+                self.enviar_alerta(f"🚀 COMPRA: {symbol} a {preco:.2f} ({estrategia.nome})")
+                return "COMPRA"
+        saldo_asset = self.exchange_info.ajustar_quantidade(symbol, saldo_asset)
+        if cond_venda and confirma_venda and ativo:
+            if saldo_asset * preco >= min_notional and saldo_asset > 0:
+                with self.metricas.span("ordem"):
+                    ordem = conta.client.order_market_sell(symbol=symbol, quantity=saldo_asset)
+                conta.portfolio.invalidate()
+                preco = self.registrar_operacao(agora, symbol, "VENDA", ordem, estrategia, conta)
+                self.enviar_alerta(f"🔻 VENDA: {symbol} a {preco:.2f} ({estrategia.nome})")
+                return "VENDA"
+        return "-"
+
+    def executar_trade(self, cfg, agora_ms, estrategias=None):
+        todas = criar_estrategias(cfg)
+        estrategias = todas if estrategias is None else estrategias
+        self.derivado = modo_derivado(todas)
+        # O saldo USDT de cada conta é dividido entre todos os pares (estratégia, símbolo) dela
+        vagas = {}
+        for e in todas:
+            vagas[e.conta] = vagas.get(e.conta, 0) + len(e.symbols)
+        saldos = {}
+        for nome in {e.conta for e in estrategias}:
+            try:
+                # Um snapshot de cada conta por tick, compartilhado por todos os símbolos
+                with self.metricas.span("saldo"):
+                    saldos[nome] = self.conta(nome).portfolio.snapshot(force=True).saldo('USDT')
+            except Exception as e:
+                self.erro(f"Erro ao consultar saldo USDT da conta {nome}: {e}")
+                saldos[nome] = 0
+        por_symbol = {}
+        for e in estrategias:
+            for symbol in e.symbols:
+                por_symbol.setdefault(symbol, []).append(e)
+        resultados = {e.nome: {} for e in estrategias}
+        self.estado["resultados"] = resultados
+        # Um símbolo que ainda roda desde um tick anterior fica de fora: nunca duas threads no mesmo símbolo
+        with self._lock:
+            ocupados = set(self.em_andamento) & set(por_symbol)
+        for symbol in ocupados:
+            for e in por_symbol.pop(symbol):
+                resultados[e.nome][symbol] = "em andamento"
+            self.erro(f"{symbol} ainda em processamento desde um tick anterior; pulado neste tick")
+        # Cada símbolo roda num worker do pool: o tick dura o tempo do símbolo mais lento, não a soma.
+        pool = self.get_pool(cfg["max_workers"])
+        futures = {}
+        for symbol, lista in por_symbol.items():
+            future = pool.submit(self.processar_symbol, symbol, lista, cfg, agora_ms, saldos, vagas)
+            with self._lock:
+                self.em_andamento[symbol] = future
+            future.add_done_callback(lambda f, symbol=symbol: self._liberar(symbol, f))
+            futures[future] = symbol
+        _, pendentes = wait(futures, timeout=cfg["timeout_symbol"])
+        for future, symbol in futures.items():
+            if future in pendentes:
+                por_estrategia = {e.nome: "timeout" for e in por_symbol[symbol]}
+                self.metricas.contar("erros", etapa="timeout")
+                self.erro(f"Tempo esgotado ao processar {symbol} ({cfg['timeout_symbol']}s)")
+                # Na fila ainda dá para cancelar; rodando, não: o resultado (e uma ordem enviada) entra quando terminar
+                if not future.cancel():
+                    future.add_done_callback(lambda f, symbol=symbol, lista=por_symbol[symbol]: self._concluir_atrasado(symbol, lista, f))
+            elif future.exception() is not None:
+                por_estrategia = {e.nome: "erro" for e in por_symbol[symbol]}
+                self.erro(f"Erro ao processar {symbol}: {future.exception()}")
+            else:
+                por_estrategia = future.result()
+            for nome, resultado in por_estrategia.items():
+                resultados[nome][symbol] = resultado
+        for nome in {e.conta for e in estrategias}:
+            if any(r in ("COMPRA", "VENDA") for e in estrategias if e.conta == nome for r in resultados[e.nome].values()):
+                self.conta(nome).portfolio.invalidate()
+        return resultados
+
+    def _liberar(self, symbol, future):
+        with self._lock:
+            if self.em_andamento.get(symbol) is future:
+                del self.em_andamento[symbol]
+
+    def _concluir_atrasado(self, symbol, estrategias, future):
+        if future.exception() is not None:
+            self.erro(f"Erro ao processar {symbol} (após o timeout): {future.exception()}")
+            return
+        por_estrategia = future.result()
+        log.info("%s terminou depois do timeout: %s", symbol, por_estrategia)
+        with self._lock:
+            for nome, resultado in por_estrategia.items():
+                self.estado["resultados"].setdefault(nome, {})[symbol] = resultado
+        for conta in {e.conta for e in estrategias if por_estrategia.get(e.nome) in ("COMPRA", "VENDA")}:
+            self.conta(conta).portfolio.invalidate()
+
+    def tick(self, agora_ms=None):
+        agora_ms = agora_ms or int(time.time() * 1000)
+        cfg = ler_config()
+        self.metricas.ativo = cfg["metricas"]
+        try:
+            todas = criar_estrategias(cfg)
+        except (KeyError, ValueError) as e:
+            self.erro(f"Configuração de estratégias inválida: {e}")
+            todas = []
+        self.derivado = modo_derivado(todas)
+        with self._lock:
+            self.estado["sinais"] = {e.nome: self.estado["sinais"].get(e.nome, {}) for e in todas}
+        try:
+            self.atualizar_stream(cfg, todas)
+        except Exception as e:
+            self.erro(f"Erro no stream de mercado: {e}")
+        # Só as estratégias cujo candle acabou de fechar
+        estrategias = [e for e in todas if candle_fechou(e.intervalo, agora_ms)]
+        if estrategias:
+            inicio = time.time()
+            with self.metricas.span("tick"):
+                self.executar_trade(cfg, agora_ms, estrategias)
+            self.estado["ultimo_candle"] = datetime.fromtimestamp(agora_ms / 1000).strftime("%Y-%m-%d %H:%M:%S")
+            self.estado["duracao_tick"] = time.time() - inicio
+            salvar_json(INDICADORES_FILE, self.indicadores.snapshot())
+        self.publicar_estado(cfg, agora_ms, todas)
+
+    def publicar_estado(self, cfg, agora_ms, estrategias=()):
+        passo = min((INTERVAL_MS[e.intervalo] for e in estrategias), default=INTERVAL_MS[cfg["intervalo"]])
+        metricas = self.metricas.resumo() if self.metricas.ativo else None
+        # Workers que passaram do timeout ainda podem alterar o estado: grava uma cópia tirada sob o lock
+        with self._lock:
+            self.estado["heartbeat"] = datetime.fromtimestamp(agora_ms / 1000).strftime("%Y-%m-%d %H:%M:%S")
+            self.estado["proximo_candle"] = datetime.fromtimestamp((agora_ms // passo + 1) * passo / 1000).strftime("%Y-%m-%d %H:%M:%S")
+            self.estado["config"] = cfg
+            self.estado["pid"] = os.getpid()
+            self.estado["metricas"] = metricas
+            estado = copy.deepcopy(self.estado)
+        salvar_json(STATE_FILE, estado)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    lock = adquirir_lock()
+    if lock is None:
+        log.error("Outro motor já está rodando (engine.lock).")
+        sys.exit(1)
+    load_dotenv()
+    # Sem credenciais do Twilio os alertas vão para alertas.log
+    if os.getenv("TWILIO_SID"):
+        sink = twilio_sink(TwilioClient(os.getenv("TWILIO_SID"), os.getenv("TWILIO_AUTH")),
+                           f'whatsapp:{os.getenv("TWILIO_NUMBER")}', f'whatsapp:{os.getenv("DEST_NUMBER")}')
+    else:
+        sink = LocalSink("alertas.log")
+    cfg = ler_config()
+    metricas = Metrics(ativo=cfg["metricas"])
+    # Limite de peso do IP e pool de conexões compartilhados por todas as threads do motor
+    client = Gateway(
+        criar_client(os.getenv("BINANCE_API_KEY"), os.getenv("BINANCE_API_SECRET"), requests_params={"timeout": 10}),
+        conexoes=max(cfg["max_workers"], 10) + 2,
+        metricas=metricas,
+    )
+
+    def criar_conta(nome):
+        sufixo = nome.upper()
+        api_key = os.getenv(f"BINANCE_API_KEY_{sufixo}")
+        if not api_key and not os.getenv("ROBO_SIMULADOR"):
+            raise KeyError(f"BINANCE_API_KEY_{sufixo} não definida")
+        return Gateway(criar_client(api_key, os.getenv(f"BINANCE_API_SECRET_{sufixo}"), requests_params={"timeout": 10}),
+                       metricas=metricas)
+
+    engine = Engine(client, alertas=AlertDispatcher(sink), metricas=metricas, criar_conta=criar_conta,
+                    indicadores=ler_indicadores())
+    # GET /metrics (Prometheus) quando METRICAS_PORTA estiver definida
+    if os.getenv("METRICAS_PORTA"):
+        servir(engine.metricas, int(os.getenv("METRICAS_PORTA")))
+    # exchangeInfo carregado uma vez na partida; depois renovado pelo TTL
+    engine.exchange_info.refresh()
+    scheduler = BlockingScheduler()
+    # Segundo 2 de cada minuto: dá tempo para a Binance fechar o candle anterior.
+    scheduler.add_job(engine.tick, "cron", second=2, max_instances=1, coalesce=True)
+    log.info("Motor iniciado.")
+    try:
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        engine.alertas.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,294 +1,303 @@
 import streamlit as st
 import pandas as pd
 import os
+import threading
+import time
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from datetime import datetime, timedelta
-from binance.client import Client
 from dotenv import load_dotenv
-from technical.indicators import MACD, RSI
-from twilio.rest import Client as TwilioClient
+from technical.indicators import indicadores_batch
 from streamlit_autorefresh import st_autorefresh
-from decimal import Decimal, ROUND_DOWN
+from dashboard.charts import ChartCache, candles_grafico, fig_lucro, fig_macd, fig_medias, fig_saldo_diario, intervalo_grafico, janela
+from market.klines import INTERVAL_MS, KlineStore, times_of
+from market.portfolio import Portfolio
+from market.gateway import PAINEL, Gateway
+from market.simulator import criar_client
+from market.stream import MarketStream
+from monitor.metrics import ClienteMedido, Metrics
+from trading.ledger import abrir_ledger
+from trading.trade_store import abrir_trade_store
+from engine import ler_estado, ler_config, salvar_json, CONFIG_FILE
 
 load_dotenv()
 API_KEY = os.getenv("BINANCE_API_KEY")
 API_SECRET = os.getenv("BINANCE_API_SECRET")
-TWILIO_SID = os.getenv("TWILIO_SID")
-TWILIO_AUTH = os.getenv("TWILIO_AUTH")
-TWILIO_NUMBER = os.getenv("TWILIO_NUMBER")
-DEST_NUMBER = os.getenv("DEST_NUMBER")
-
-twilio = TwilioClient(TWILIO_SID, TWILIO_AUTH)
 
 st.set_page_config(layout="wide")
 sns.set_palette("pastel")
 plt.style.use("seaborn-v0_8-pastel")
 
 symbols = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT", "ADAUSDT"]
-log_file = "operacoes_log.csv"
+LEDGER_FILE = "ledger.json"
+
+# Os controles partem da configuração atual do motor, para uma aba nova não sobrescrever a de outra
+config = ler_config()
+intervalos = ["15m", "5m", "1h"]
 
 st.sidebar.title("⚙️ Configurações")
-st.session_state.trading_ativo = st.sidebar.toggle("🚦 Robô Ativo", True)
+st.session_state.trading_ativo = st.sidebar.toggle("🚦 Robô Ativo", config["trading_ativo"])
 st.session_state.autorefresh = st.sidebar.toggle("🔄 Autoatualização", True)
-intervalo = st.sidebar.selectbox("⏱️ Intervalo de Análise", ["15m", "5m", "1h"], index=0)
+intervalo = st.sidebar.selectbox("⏱️ Intervalo de Análise", intervalos, index=intervalos.index(config["intervalo"]) if config["intervalo"] in intervalos else 0)
+
+macd_fast = st.sidebar.slider("MACD Fast EMA", 5, 20, config["macd_fast"])
+macd_slow = st.sidebar.slider("MACD Slow EMA", 15, 50, config["macd_slow"])
+macd_signal = st.sidebar.slider("MACD Signal EMA", 5, 20, config["macd_signal"])
 
-macd_fast = st.sidebar.slider("MACD Fast EMA", 5, 20, 12)
-macd_slow = st.sidebar.slider("MACD Slow EMA", 15, 50, 26)
-macd_signal = st.sidebar.slider("MACD Signal EMA", 5, 20, 9)
+usar_websocket = st.sidebar.toggle("📡 Dados em tempo real (WebSocket)", config["usar_websocket"])
+# Intervalos maiores que o de análise; o motor monta todos a partir de uma única série de 1m
+opcoes_timeframes = [i for i in ["5m", "15m", "1h", "4h", "1d"] if INTERVAL_MS[i] > INTERVAL_MS[intervalo]]
+timeframes = st.sidebar.multiselect("🧭 Confirmar em timeframes", opcoes_timeframes,
+                                    [i for i in config["timeframes"] if i in opcoes_timeframes])
 
-usar_ema_cross = st.sidebar.checkbox("Ativar EMA9 x EMA21", True)
-stop_loss_percent = st.sidebar.slider("Stop Loss (%)", 1, 20, 5) / 100
+usar_ema_cross = st.sidebar.checkbox("Ativar EMA9 x EMA21", config["usar_ema_cross"])
 st.sidebar.markdown("## Período dos Gráficos")
 periodo_grafico = st.sidebar.selectbox("📅 Escolha o Período", ["1h", "24h", "5d", "30d", "1ano"], index=1)
+backend_grafico = st.sidebar.radio("🖼️ Gráficos", ["Matplotlib (cache)", "Nativo (navegador)"], index=0)
+diagnostico = st.sidebar.toggle("🩺 Diagnóstico (latências e chamadas REST)", config["metricas"])
 
 if st.session_state.autorefresh:
     st_autorefresh(interval=30000)
 
+def salvar_config(cfg):
+    # Só regrava quando algo mudou, para o motor não reler à toa
+    if {**config, **cfg} != config:
+        salvar_json(CONFIG_FILE, {**config, **cfg})
+
+@st.cache_resource
+def get_metricas():
+    return Metrics(ativo=False)
+
+metricas = get_metricas()
+metricas.ativo = diagnostico
+inicio_render = time.perf_counter()
+
 @st.cache_resource
 def get_binance_client():
-    return Client(API_KEY, API_SECRET)
+    # Leituras do painel ficam atrás das do motor e não consomem a reserva de peso das ordens
+    return ClienteMedido(Gateway(criar_client(API_KEY, API_SECRET), prioridade=PAINEL, metricas=get_metricas()), get_metricas())
 
-def ajustar_quantidade(symbol, quantidade):
-    client = get_binance_client()
-    info = client.get_symbol_info(symbol)
-    step_size = Decimal(next(f['stepSize'] for f in info['filters'] if f['filterType'] == 'LOT_SIZE'))
-    precision = abs(step_size.as_tuple().exponent)
-    return float(Decimal(quantidade).quantize(Decimal(10) ** -precision, rounding=ROUND_DOWN))
+@st.cache_resource
+def get_kline_store():
+    return KlineStore()
 
-def get_klines(symbol, interval=Client.KLINE_INTERVAL_15MINUTE, limit=100):
+@st.cache_resource
+def get_streams():
+    # Um único stream vivo: trocar símbolos/intervalo para o anterior em vez de deixar a thread rodando
+    return {"stream": None, "lock": threading.Lock()}
+
+def get_market_stream(symbols, intervalo):
+    atual = get_streams()
+    with atual["lock"]:
+        stream = atual["stream"]
+        if stream and stream.symbols == list(symbols) and stream.interval == intervalo:
+            return stream
+        if stream:
+            stream.stop()
+        stream = MarketStream(symbols, intervalo, get_kline_store())
+        stream.warm(get_binance_client())
+        atual["stream"] = stream.start()
+        return stream
+
+def parar_market_stream():
+    atual = get_streams()
+    with atual["lock"]:
+        if atual["stream"]:
+            atual["stream"].stop()
+            atual["stream"] = None
+
+def get_klines(symbol, interval=None, limit=100):
     client = get_binance_client()
+    interval = interval or intervalo
     try:
-        intervalo_binance = {"15m": Client.KLINE_INTERVAL_15MINUTE, "5m": Client.KLINE_INTERVAL_5MINUTE, "1h": Client.KLINE_INTERVAL_1HOUR}[intervalo]
-        klines = client.get_klines(symbol=symbol, interval=intervalo_binance, limit=limit)
-        closes = [float(k[4]) for k in klines]
-        times = [datetime.fromtimestamp(int(k[0]/1000)) for k in klines]
-        return closes, times
+        series = get_market_stream(tuple(symbols), intervalo).klines(symbol, limit) if usar_websocket and interval == intervalo else None
+        if series is None:
+            series = get_kline_store().get(client, symbol, interval, limit)
+        return series["close"], times_of(series)
     except Exception as e:
         st.warning(f"Erro ao processar {symbol}: {e}")
         return None, None
 
-def analisar_macd(symbol):
-    closes, _ = get_klines(symbol)
-    if closes is None or len(closes) == 0:
-        return False, False, closes
-    macd_line, signal_line, _ = MACD(closes, macd_fast, macd_slow, macd_signal)
-    cruzamento_compra = macd_line[-2] < signal_line[-2] and macd_line[-1] > signal_line[-1]
-    cruzamento_venda = macd_line[-2] > signal_line[-2] and macd_line[-1] < signal_line[-1]
-    return cruzamento_compra, cruzamento_venda, closes
+@st.cache_resource
+def get_trade_store():
+    return abrir_trade_store()
 
-def registrar_operacao(horario, moeda, tipo, preco, qtd):
-    with open(log_file, "a") as f:
-        f.write(f"{horario},{moeda},{tipo},{preco:.2f},{qtd},{macd_fast},{macd_slow},{macd_signal}\n")
+@st.cache_resource
+def get_chart_cache():
+    return ChartCache()
 
-def enviar_alerta(mensagem):
-    try:
-        twilio.messages.create(
-            body=mensagem,
-            from_=f'whatsapp:{TWILIO_NUMBER}',
-            to=f'whatsapp:{DEST_NUMBER}'
-        )
-    except Exception as e:
-        st.warning(f"Falha ao enviar alerta via Twilio: {e}")
+chart_cache = get_chart_cache()
+
+if not usar_websocket:
+    parar_market_stream()
+
+@st.cache_resource
+def get_ledger():
+    return abrir_ledger(get_trade_store(), LEDGER_FILE)
+
+@st.cache_resource
+def get_portfolio():
+    return Portfolio(get_binance_client())
 
 def get_price(symbol):
-    client = get_binance_client()
     try:
-        price = float(client.get_symbol_ticker(symbol=symbol)['price'])
-        return price
+        price = get_market_stream(tuple(symbols), intervalo).price(symbol) if usar_websocket else None
+        if price is not None:
+            return price
+        return get_portfolio().preco(symbol)
     except Exception:
         return 0.0
 
-def mostrar_saldo_total_sidebar():
-    client = get_binance_client()
-    if not client:
-        st.sidebar.markdown("**Erro de conexão.**")
-        return
-
-    try:
-        saldo_usdt = float(client.get_asset_balance(asset='USDT')['free'])
-        saldo_btc = float(client.get_asset_balance(asset='BTC')['free'])
-        saldo_eth = float(client.get_asset_balance(asset='ETH')['free'])
-        saldo_sol = float(client.get_asset_balance(asset='SOL')['free'])
-        saldo_xrp = float(client.get_asset_balance(asset='XRP')['free'])
-        saldo_ada = float(client.get_asset_balance(asset='ADA')['free'])
-
-        cot_btc = get_price("BTCUSDT")
-        cot_eth = get_price("ETHUSDT")
-        cot_sol = get_price("SOLUSDT")
-        cot_xrp = get_price("XRPUSDT")
-        cot_ada = get_price("ADAUSDT")
-
-        saldo_total = (
-            saldo_usdt +
-            saldo_btc * cot_btc +
-            saldo_eth * cot_eth +
-            saldo_sol * cot_sol +
-            saldo_xrp * cot_xrp +
-            saldo_ada * cot_ada
-        )
-
-        st.sidebar.markdown("## 💰 Saldo Total em USDT")
-        st.sidebar.markdown(f"**{saldo_total:.2f} USDT**")
-
-    except Exception as e:
-        st.sidebar.warning(f"Erro ao obter saldo total: {e}")
+# Ativos exibidos: a moeda de cotação mais a base de cada símbolo monitorado
+assets = ["USDT"] + [symbol.replace("USDT", "") for symbol in symbols]
 
-def executar_trade():
-    client = get_binance_client()
-    if not client:
-        st.warning("Erro de conexão com a Binance.")
-        return
-    try:
-        saldo_usdt = float(client.get_asset_balance(asset='USDT')['free'])
-    except Exception as e:
-        st.warning(f"Erro ao consultar saldo USDT: {e}")
-        saldo_usdt = 0
-    for symbol in symbols:
-        try:
-            base_asset = symbol.replace('USDT', '')
-            saldo_asset = float(client.get_asset_balance(asset=base_asset)['free'])
-            cond_compra_macd, cond_venda_macd, closes = analisar_macd(symbol)
-            if closes is None or len(closes) < 3:
-                continue
-            ema9 = pd.Series(closes).ewm(span=9, adjust=False).mean()
-            ema21 = pd.Series(closes).ewm(span=21, adjust=False).mean()
-            ema_cross_compra = ema9.iloc[-2] < ema21.iloc[-2] and ema9.iloc[-1] > ema21.iloc[-1]
-            ema_cross_venda = ema9.iloc[-2] > ema21.iloc[-2] and ema9.iloc[-1] < ema21.iloc[-1]
-            preco = closes[-1]
-            quantidade = ajustar_quantidade(symbol, saldo_usdt / (len(symbols) * preco))
-            info = client.get_symbol_info(symbol)
-            min_notional = float(next(f['minNotional'] for f in info['filters'] if f['filterType'] == 'MIN_NOTIONAL'))
-            agora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            # COMPRA (MACD ou EMA cruzou para cima)
-            if (cond_compra_macd or (usar_ema_cross and ema_cross_compra)) and st.session_state.trading_ativo:
-                if quantidade * preco >= min_notional:
-                    client.order_market_buy(symbol=symbol, quantity=quantidade)
-                    registrar_operacao(agora, symbol, "COMPRA", preco, quantidade)
-                    enviar_alerta(f"🚀 COMPRA: {symbol} a {preco:.2f}")
-            saldo_asset = ajustar_quantidade(symbol, saldo_asset)
-            # VENDA (MACD ou EMA cruzou para baixo)
-            # SE QUISER VENDER SÓ POR EMA, troque o if para: if (usar_ema_cross and ema_cross_venda) and st.session_state.trading_ativo:
-            if (cond_venda_macd or (usar_ema_cross and ema_cross_venda)) and st.session_state.trading_ativo:
-                if saldo_asset * preco >= min_notional and saldo_asset > 0:
-                    client.order_market_sell(symbol=symbol, quantity=saldo_asset)
-                    registrar_operacao(agora, symbol, "VENDA", preco, saldo_asset)
-                    enviar_alerta(f"🔻 VENDA: {symbol} a {preco:.2f}")
-        except Exception as e:
-            st.warning(f"Erro ao processar {symbol}: {e}")
+def mostrar_saldo_total_sidebar(portfolio):
+    saldo_total = sum(
+        portfolio.saldo(asset) * (1.0 if asset == "USDT" else get_price(f"{asset}USDT"))
+        for asset in assets
+    )
+    st.sidebar.markdown("## 💰 Saldo Total em USDT")
+    st.sidebar.markdown(f"**{saldo_total:.2f} USDT**")
 
+marca = time.perf_counter()
 client = get_binance_client()
 if client:
-    mostrar_saldo_total_sidebar()
     try:
-        saldo_usdt = float(client.get_asset_balance(asset='USDT')['free'])
-        saldo_btc = float(client.get_asset_balance(asset='BTC')['free'])
-        saldo_eth = float(client.get_asset_balance(asset='ETH')['free'])
-        saldo_sol = float(client.get_asset_balance(asset='SOL')['free'])
-        saldo_xrp = float(client.get_asset_balance(asset='XRP')['free'])
-        saldo_ada = float(client.get_asset_balance(asset='ADA')['free'])
+        portfolio = get_portfolio().snapshot()
+        mostrar_saldo_total_sidebar(portfolio)
         st.markdown(f"## 💰 Saldos Atuais na Binance:")
-        st.markdown(f"- USDT: {saldo_usdt:.4f}")
-        st.markdown(f"- BTC: {saldo_btc:.6f}")
-        st.markdown(f"- ETH: {saldo_eth:.6f}")
-        st.markdown(f"- SOL: {saldo_sol:.4f}")
-        st.markdown(f"- XRP: {saldo_xrp:.2f}")
-        st.markdown(f"- ADA: {saldo_ada:.2f}")
+        for asset in assets:
+            st.markdown(f"- {asset}: {portfolio.saldo(asset):.{4 if asset == 'USDT' else 6}f}")
     except Exception as e:
+        st.sidebar.warning(f"Erro ao obter saldo total: {e}")
         st.warning(f"Erro ao obter saldos da Binance: {e}")
+metricas.observar("render:saldos", time.perf_counter() - marca)
+
+salvar_config({
+    "trading_ativo": st.session_state.trading_ativo,
+    "symbols": symbols,
+    "intervalo": intervalo,
+    "macd_fast": macd_fast,
+    "macd_slow": macd_slow,
+    "macd_signal": macd_signal,
+    "usar_ema_cross": usar_ema_cross,
+    "usar_websocket": usar_websocket,
+    "metricas": diagnostico,
+    "timeframes": timeframes,
+})
 
-if st.session_state.trading_ativo:
-    executar_trade()
+# As ordens são enviadas pelo motor (engine.py); o painel só mostra o estado publicado por ele.
+st.subheader("🤖 Motor de Trading")
+estado = ler_estado()
+if not estado:
+    st.warning("Motor de trading não está rodando. Inicie com: python engine.py")
+else:
+    heartbeat = datetime.strptime(estado["heartbeat"], "%Y-%m-%d %H:%M:%S")
+    if datetime.now() - heartbeat > timedelta(minutes=3):
+        st.warning(f"Motor sem sinal desde {estado['heartbeat']}.")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Último candle avaliado", estado.get("ultimo_candle", "-"))
+    col2.metric("Próximo candle", estado.get("proximo_candle", "-"))
+    col3.metric("Duração do tick (s)", f"{estado.get('duracao_tick', 0):.2f}")
+    # Um quadro por estratégia (a do painel é "macd"; outras vêm de "estrategias" no config_robo.json)
+    for nome, sinais in estado["sinais"].items():
+        if sinais:
+            if len(estado["sinais"]) > 1:
+                st.caption(f"Estratégia {nome}")
+            st.dataframe(pd.DataFrame.from_dict(sinais, orient="index"), use_container_width=True)
+    for horario, mensagem in estado["erros"][-5:]:
+        st.caption(f"⚠️ {horario} - {mensagem}")
 
 st.subheader("📋 Histórico Completo de Negociações")
+marca = time.perf_counter()
 
-if os.path.exists(log_file):
-    df_log = pd.read_csv(log_file, header=None, names=["horario", "moeda", "tipo", "preco", "qtd", "macd_fast", "macd_slow", "macd_signal"])
-    df_log = df_log[pd.to_datetime(df_log['horario'], errors='coerce').notnull()]
-    df_log['horario'] = pd.to_datetime(df_log['horario'], errors='coerce')
-    df_log.dropna(subset=['horario'], inplace=True)
-    df_log.sort_values('horario', inplace=True)
-    st.dataframe(df_log.sort_values('horario', ascending=False), use_container_width=True)
-    trades = []
-    position = {}
-    for index, row in df_log.iterrows():
-        key = row['moeda']
-        if row['tipo'] == 'COMPRA':
-            position[key] = {'preco': row['preco'], 'qtd': row['qtd'], 'data': row['horario']}
-        elif row['tipo'] == 'VENDA' and key in position:
-            compra = position.pop(key)
-            stop_loss = compra['preco'] * (1 - stop_loss_percent)
-            if row['preco'] < stop_loss:
-                lucro = (stop_loss - compra['preco']) * row['qtd']
-            else:
-                lucro = (row['preco'] - compra['preco']) * row['qtd']
-            trades.append({
-                'Moeda': key,
-                'Data Compra': compra['data'],
-                'Preço Compra': compra['preco'],
-                'Data Venda': row['horario'],
-                'Preço Venda': row['preco'],
-                'Quantidade': row['qtd'],
-                'Lucro/Prejuízo': lucro
-            })
-    df_trades = pd.DataFrame(trades)
+trade_store = get_trade_store()
+if trade_store.contar():
+    # Tabela: só as últimas operações, direto do índice por horário
+    st.dataframe(trade_store.consultar(limite=500, decrescente=True), use_container_width=True)
+    # P&L por lote (FIFO) já calculado pelo ledger; aqui só entram as operações novas
+    ledger = get_ledger()
+    if ledger.sincronizar(trade_store):
+        ledger.salvar(LEDGER_FILE)
+    df_trades = pd.DataFrame(list(ledger.fechamentos)[-500:])
     if not df_trades.empty:
+        df_trades['Data Venda'] = pd.to_datetime(df_trades['Data Venda'])
         st.dataframe(df_trades, use_container_width=True)
-        fig3, ax3 = plt.subplots()
-        ax3.bar(df_trades['Data Venda'], df_trades['Lucro/Prejuízo'], color=np.where(df_trades['Lucro/Prejuízo']>=0, 'green', 'red'))
-        ax3.set_xlabel('Data da Venda')
-        ax3.set_ylabel('Lucro/Prejuízo (USDT)')
-        ax3.set_title('Lucro/Prejuízo por Operação')
-        fig3.autofmt_xdate()
-        st.pyplot(fig3)
-        st.subheader("📅 Saldo Consolidado Diário")
-        df_log['Dia'] = df_log['horario'].dt.date
-        df_log['Lucro'] = df_log.apply(lambda row: row['preco'] * row['qtd'] if row['tipo'] == 'VENDA' else -row['preco'] * row['qtd'], axis=1)
-        saldo_diario = df_log.groupby('Dia')['Lucro'].sum().cumsum().reset_index()
-        fig4, ax4 = plt.subplots()
-        ax4.plot(saldo_diario['Dia'], saldo_diario['Lucro'], marker='o')
-        ax4.set_xlabel('Dia')
-        ax4.set_ylabel('Lucro Acumulado (USDT)')
-        ax4.set_title('Evolução do Saldo Diário')
-        fig4.autofmt_xdate()
-        st.pyplot(fig4)
+        saldo_diario = pd.DataFrame([
+            {'Dia': pd.to_datetime(dia), 'Lucro': ledger.diario[dia]['fluxo_acumulado']} for dia in sorted(ledger.diario)
+        ])
+        if backend_grafico == "Nativo (navegador)":
+            st.bar_chart(df_trades.set_index('Data Venda')['Lucro/Prejuízo'])
+            st.subheader("📅 Saldo Consolidado Diário")
+            st.line_chart(saldo_diario.set_index('Dia')['Lucro'])
+        else:
+            # Só re-renderiza quando entra uma operação nova no ledger
+            st.image(chart_cache.render(("lucro", ledger.ultimo_id), lambda: fig_lucro(df_trades)))
+            st.subheader("📅 Saldo Consolidado Diário")
+            st.image(chart_cache.render(("saldo_diario", ledger.ultimo_id), lambda: fig_saldo_diario(saldo_diario)))
 else:
     st.info("Nenhuma operação registrada ainda.")
+metricas.observar("render:historico", time.perf_counter() - marca)
 
 st.subheader("📈 MACD, Médias Móveis e RSI por Moeda")
+marca = time.perf_counter()
+# Períodos longos usam um intervalo maior; a janela exibida é reduzida a ~300 pontos
+intervalo_g = intervalo_grafico(periodo_grafico, intervalo)
+series = {}
 for symbol in symbols:
-    closes, times = get_klines(symbol)
+    closes, times = get_klines(symbol, intervalo_g, candles_grafico(periodo_grafico, intervalo_g))
     if closes is None or times is None or len(closes) < 3:
         continue
-    macd_line, signal_line, _ = MACD(closes, macd_fast, macd_slow, macd_signal)
-    rsi_vals = RSI(closes, 14)
-    ema9 = pd.Series(closes).ewm(span=9, adjust=False).mean()
-    ema21 = pd.Series(closes).ewm(span=21, adjust=False).mean()
-    fig, ax = plt.subplots()
-    ax.plot(times[-len(ema9):], ema9, linestyle='-', alpha=0.6, label='EMA 9')
-    ax.plot(times[-len(ema21):], ema21, linestyle='-', alpha=0.6, label='EMA 21')
-    ax.set_xlabel('Data/Hora')
-    ax.set_ylabel('Médias Móveis')
-    ax.set_title(f'{symbol} - EMA 9 e EMA 21')
-    ax.legend()
-    fig.autofmt_xdate()
-    st.pyplot(fig)
-    fig2, ax2 = plt.subplots()
-    ax2.plot(times[-len(macd_line):], macd_line, linestyle='--', label='MACD')
-    ax2.plot(times[-len(signal_line):], signal_line, linestyle=':', label='Signal')
-    ax2.set_xlabel('Data/Hora')
-    ax2.set_ylabel('MACD e Signal')
-    ax2.set_title(f'{symbol} - MACD vs Signal')
-    ax2.legend()
-    fig2.autofmt_xdate()
-    st.pyplot(fig2)
+    series[symbol] = (closes, times)
+if series:
+    # Todos os símbolos numa matriz (n_símbolos x n_candles): os indicadores saem num único passe
+    n = min(len(closes) for closes, _ in series.values())
+    ind = indicadores_batch(np.array([closes[-n:] for closes, _ in series.values()]), macd_fast, macd_slow, macd_signal)
+for i, (symbol, (closes, times)) in enumerate(series.items()):
+    times = times[-n:]
+    idx = janela(times, periodo_grafico)
+    times = times[idx]
+    macd_line, signal_line, rsi_vals = ind["macd"][i][idx], ind["signal"][i][idx], ind["rsi"][i][idx]
+    ema9, ema21 = ind["ema_curta"][i][idx], ind["ema_longa"][i][idx]
+    chave = (symbol, intervalo_g, periodo_grafico, str(times[-1]), float(closes[-1]), macd_fast, macd_slow, macd_signal)
+    if backend_grafico == "Nativo (navegador)":
+        st.caption(f'{symbol} - EMA 9 e EMA 21')
+        st.line_chart(pd.DataFrame({'EMA 9': ema9, 'EMA 21': ema21}, index=times))
+        st.caption(f'{symbol} - MACD vs Signal')
+        st.line_chart(pd.DataFrame({'MACD': macd_line, 'Signal': signal_line}, index=times))
+    else:
+        st.image(chart_cache.render(chave + ("medias",), lambda: fig_medias(symbol, times, ema9, ema21)))
+        st.image(chart_cache.render(chave + ("macd",), lambda: fig_macd(symbol, times, macd_line, signal_line)))
     df_ind = pd.DataFrame({
-        'Horário': times[-len(macd_line):],
+        'Horário': times,
         'MACD': macd_line,
         'Signal': signal_line,
-        'RSI': rsi_vals[-len(macd_line):],
-        'EMA 9': ema9[-len(macd_line):],
-        'EMA 21': ema21[-len(macd_line):]
+        'RSI': rsi_vals,
+        'EMA 9': ema9,
+        'EMA 21': ema21
     })
-    st.dataframe(df_ind, use_container_width=True)
\ No newline at end of file
+    st.dataframe(df_ind, use_container_width=True)
+metricas.observar("render:graficos", time.perf_counter() - marca)
+metricas.observar("render:total", time.perf_counter() - inicio_render)
+
+if diagnostico:
+    with st.expander("🩺 Diagnóstico", expanded=True):
+        st.markdown("**Motor** (desde a partida)")
+        resumo_motor = (estado or {}).get("metricas")
+        if resumo_motor:
+            st.dataframe(pd.DataFrame(resumo_motor["etapas"]).round(2), use_container_width=True)
+            st.dataframe(pd.DataFrame(resumo_motor["contadores"]), use_container_width=True)
+            if resumo_motor.get("medidores"):
+                st.dataframe(pd.DataFrame(resumo_motor["medidores"]), use_container_width=True)
+        else:
+            st.caption("O motor publica as métricas no próximo minuto.")
+        st.markdown("**Painel** (desde que o diagnóstico foi ligado)")
+        resumo_painel = metricas.resumo()
+        if resumo_painel["etapas"]:
+            st.dataframe(pd.DataFrame(resumo_painel["etapas"]).round(2), use_container_width=True)
+        if resumo_painel["contadores"]:
+            st.dataframe(pd.DataFrame(resumo_painel["contadores"]), use_container_width=True)
+        if resumo_painel["medidores"]:
+            st.dataframe(pd.DataFrame(resumo_painel["medidores"]), use_container_width=True)
+        st.caption(f"Cache de gráficos: {chart_cache.hits} reaproveitados, {chart_cache.renders} renderizados")
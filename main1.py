@@ -9,10 +9,17 @@ import seaborn as sns
 from datetime import datetime, timedelta
 from binance.client import Client
 from dotenv import load_dotenv
-from technical.indicators import RSI, MACD, EMA
+from technical.signals import sinal_indicadores
 from twilio.rest import Client as TwilioClient
 from apscheduler.schedulers.background import BackgroundScheduler
 from streamlit_autorefresh import st_autorefresh
+from market.klines import KlineStore, times_of
+from market.portfolio import Portfolio
+from market.gateway import Gateway
+from market.simulator import criar_client
+from trading.alerts import AlertDispatcher, twilio_sink
+from trading.ledger import abrir_ledger
+from trading.trade_store import abrir_trade_store, execucao
 
 st.set_page_config(layout="wide")
 sns.set_palette("pastel")
@@ -52,37 +59,43 @@ if st.session_state.autorefresh:
 @st.cache_resource(show_spinner=False)
 def get_binance_client():
     try:
-        c = Client(API_KEY, API_SECRET)
+        c = Gateway(criar_client(API_KEY, API_SECRET))
         c.ping()
         return c
     except:
         return None
 
 symbols = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT", "BNBUSDT", "SHIBUSDT"]
-log_file = "operacoes_log.csv"
+
+@st.cache_resource(show_spinner=False)
+def get_trade_store():
+    return abrir_trade_store()
+
+@st.cache_resource(show_spinner=False)
+def get_ledger():
+    return abrir_ledger(get_trade_store(), "ledger.json")
 
 st.title("🤖 Robô Trader Pro - Painel de Controle")
-if os.path.exists(log_file):
-    df_log = pd.read_csv(log_file)
+if get_trade_store().contar():
     st.subheader("📊 Operações Realizadas")
-    st.dataframe(df_log[::-1], use_container_width=True)
+    st.dataframe(get_trade_store().consultar(limite=500, decrescente=True), use_container_width=True)
 else:
     st.info("Nenhuma operação registrada ainda.")
 
+@st.cache_resource(show_spinner=False)
+def get_kline_store():
+    return KlineStore()
+
+@st.cache_resource(show_spinner=False)
+def get_portfolio():
+    return Portfolio(get_binance_client())
+
 def get_klines(symbol, interval=Client.KLINE_INTERVAL_15MINUTE, limit=100):
     client = get_binance_client()
     if client:
         try:
-            intervalo_binance = {
-                "15m": Client.KLINE_INTERVAL_15MINUTE,
-                "5m": Client.KLINE_INTERVAL_5MINUTE,
-                "1h": Client.KLINE_INTERVAL_1HOUR,
-            }[intervalo]
-            klines = client.get_klines(symbol=symbol, interval=intervalo_binance, limit=limit)
-            closes = [float(k[4]) for k in klines]
-            times = [datetime.fromtimestamp(int(k[0]/1000)) for k in klines]
-            volumes = [float(k[5]) for k in klines]
-            return closes, times, volumes
+            series = get_kline_store().get(client, symbol, intervalo, limit)
+            return series["close"], times_of(series), series["volume"]
         except:
             return None, None, None
     return None, None, None
@@ -91,31 +104,26 @@ def analisar_indicadores(symbol):
     closes, _, _ = get_klines(symbol)
     if closes is None or len(closes) == 0:
         return False, False, closes
-    rsi = RSI(closes, 14)
-    macd_result = MACD(closes, 12, 26, 9)
-    macd_line, signal_line, _ = macd_result if len(macd_result) == 3 else ([], [], [])
-    ema_short = EMA(closes, ema_curto)
-    ema_long = EMA(closes, ema_longo)
-
-    cond_compra = (rsi[-1] < rsi_entrada and ema_short[-1] > ema_long[-1])
-    cond_venda = (rsi[-1] > rsi_saida and ema_short[-1] < ema_long[-1])
+    # Mesma regra usada pelo backtester (technical/signals.py)
+    compra, venda = sinal_indicadores(closes, rsi_entrada, rsi_saida, ema_curto, ema_longo, macd_confirma)
+    return bool(compra), bool(venda), closes
+
+def registrar_operacao(horario, moeda, tipo, ordem):
+    # Preço médio, quantidade executada e comissões da resposta da ordem
+    preco, qtd, taxa = execucao(ordem, moeda.replace("USDT", ""), lambda ativo: get_portfolio().preco(f"{ativo}USDT"))
+    get_trade_store().registrar(horario, moeda, tipo, preco, qtd, taxa, estrategia="rsi_ema", params={
+        "rsi_entrada": rsi_entrada, "rsi_saida": rsi_saida, "ema_curto": ema_curto,
+        "ema_longo": ema_longo, "macd_confirma": macd_confirma,
+    })
+    return preco
 
-    if macd_confirma:
-        cond_compra &= macd_line[-1] > signal_line[-1]
-        cond_venda &= macd_line[-1] < signal_line[-1]
-
-    return cond_compra, cond_venda, closes
-
-def registrar_operacao(horario, moeda, tipo, preco, qtd):
-    with open(log_file, "a") as f:
-        f.write(f"{horario},{moeda},{tipo},{preco:.2f},{qtd},{rsi_entrada},{rsi_saida},{ema_curto},{ema_longo},{macd_confirma}\n")
+@st.cache_resource(show_spinner=False)
+def get_alertas():
+    return AlertDispatcher(twilio_sink(twilio, TWILIO_NUMBER, DEST_NUMBER))
 
 def enviar_alerta(mensagem):
-    twilio.messages.create(
-        body=mensagem,
-        from_=TWILIO_NUMBER,
-        to=DEST_NUMBER
-    )
+    # Só enfileira: o envio (com novas tentativas) acontece fora do loop de ordens
+    get_alertas().alerta(mensagem)
 
 def executar_trade():
     client = get_binance_client()
@@ -125,20 +133,20 @@ def executar_trade():
     for symbol in symbols:
         try:
             cond_compra, cond_venda, closes = analisar_indicadores(symbol)
-            preco = closes[-1] if closes else None
+            preco = closes[-1] if closes is not None and len(closes) else None
             if preco is None:
                 continue
-            saldo = float(client.get_asset_balance(asset=symbol.replace("USDT", ""))['free']) if symbol != "USDT" else 0
+            saldo = get_portfolio().saldo(symbol.replace("USDT", "")) if symbol != "USDT" else 0
             quantidade = round(10 / preco, 5)
             agora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
             if cond_compra and st.session_state.trading_ativo:
-                client.order_market_buy(symbol=symbol, quantity=quantidade)
-                registrar_operacao(agora, symbol, "COMPRA", preco, quantidade)
+                ordem = client.order_market_buy(symbol=symbol, quantity=quantidade)
+                preco = registrar_operacao(agora, symbol, "COMPRA", ordem)
                 enviar_alerta(f"🚀 COMPRA: {symbol} a {preco:.2f}")
             elif cond_venda and saldo > 0 and st.session_state.trading_ativo:
-                client.order_market_sell(symbol=symbol, quantity=saldo)
-                registrar_operacao(agora, symbol, "VENDA", preco, saldo)
+                ordem = client.order_market_sell(symbol=symbol, quantity=saldo)
+                preco = registrar_operacao(agora, symbol, "VENDA", ordem)
                 enviar_alerta(f"🔻 VENDA: {symbol} a {preco:.2f}")
         except Exception as e:
             st.warning(f"Erro ao processar {symbol}: {e}")
@@ -148,15 +156,12 @@ if st.session_state.trading_ativo:
 
 st.subheader("💰 Saldo Atual")
 client = get_binance_client()
-saldo_usdt = float(client.get_asset_balance(asset='USDT')['free']) if client else 0
+saldo_usdt = get_portfolio().saldo('USDT') if client else 0
 st.metric("Saldo USDT", f"${saldo_usdt:,.2f}")
 
-if os.path.exists(log_file):
-    df_log = pd.read_csv(log_file)
-    lucro_total = 0
-    for _, row in df_log.iterrows():
-        if row['tipo'] == 'VENDA':
-            lucro_total += row['preco'] * row['qtd']
-        elif row['tipo'] == 'COMPRA':
-            lucro_total -= row['preco'] * row['qtd']
-    st.metric("Lucro Bruto Estimado", f"${lucro_total:,.2f}")
+if get_trade_store().contar():
+    ledger = get_ledger()
+    if ledger.sincronizar(get_trade_store()):
+        ledger.salvar("ledger.json")
+    st.metric("Lucro Bruto Estimado", f"${ledger.totais['fluxo']:,.2f}")
+    st.metric("Lucro Realizado (FIFO)", f"${ledger.totais['realizado']:,.2f}")
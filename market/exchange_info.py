@@ -0,0 +1,80 @@
+import threading
+import time
+from decimal import Decimal, ROUND_DOWN
+
+
+def _precision(step):
+    return max(-step.normalize().as_tuple().exponent, 0)
+
+
+def parse_filters(symbol_info):
+    # Tabela pré-calculada com os filtros usados pelo robô (LOT_SIZE, MIN_NOTIONAL/NOTIONAL, PRICE_FILTER).
+    filtros = {f['filterType']: f for f in symbol_info['filters']}
+    lot = filtros.get('LOT_SIZE', {})
+    notional = filtros.get('MIN_NOTIONAL') or filtros.get('NOTIONAL') or {}
+    price = filtros.get('PRICE_FILTER', {})
+    step_size = Decimal(lot.get('stepSize', '0.00000001'))
+    tick_size = Decimal(price.get('tickSize', '0.00000001'))
+    return {
+        "symbol": symbol_info['symbol'],
+        "base_asset": symbol_info.get('baseAsset'),
+        "quote_asset": symbol_info.get('quoteAsset'),
+        "step_size": step_size,
+        "precision": _precision(step_size),
+        "min_qty": float(lot.get('minQty', 0)),
+        "min_notional": float(notional.get('minNotional', 0)),
+        "tick_size": tick_size,
+        "tick_precision": _precision(tick_size),
+    }
+
+
+def ajustar_quantidade(quantidade, filtros):
+    step = filtros["step_size"]
+    q = (Decimal(str(quantidade)) / step).to_integral_value(rounding=ROUND_DOWN) * step
+    return float(q.quantize(Decimal(10) ** -filtros["precision"], rounding=ROUND_DOWN))
+
+
+def ajustar_preco(preco, filtros):
+    tick = filtros["tick_size"]
+    p = (Decimal(str(preco)) / tick).to_integral_value(rounding=ROUND_DOWN) * tick
+    return float(p.quantize(Decimal(10) ** -filtros["tick_precision"], rounding=ROUND_DOWN))
+
+
+class ExchangeInfo:
+    # Um snapshot de /api/v3/exchangeInfo em memória, renovado a cada `ttl` segundos.
+    def __init__(self, client, ttl=3600):
+        self.client = client
+        self.ttl = ttl
+        self.filtros = {}
+        self.loaded_at = 0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def refresh(self):
+        info = self.client.get_exchange_info()
+        filtros = {s['symbol']: parse_filters(s) for s in info['symbols']}
+        with self._lock:
+            self.filtros = filtros
+            self.loaded_at = time.time()
+        return self
+
+    def expired(self):
+        return time.time() - self.loaded_at >= self.ttl
+
+    def get(self, symbol):
+        if self.expired():
+            with self._refresh_lock:
+                if self.expired():
+                    try:
+                        self.refresh()
+                    except Exception:
+                        # Mantém o snapshot antigo se a renovação falhar
+                        if not self.filtros:
+                            raise
+        return self.filtros[symbol]
+
+    def ajustar_quantidade(self, symbol, quantidade):
+        return ajustar_quantidade(quantidade, self.get(symbol))
+
+    def min_notional(self, symbol):
+        return self.get(symbol)["min_notional"]
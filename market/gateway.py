@@ -0,0 +1,164 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+
+from monitor.metrics import peso_rest
+
+ORDEM, MOTOR, PAINEL = "ordem", "motor", "painel"
+NIVEIS = {ORDEM: 0, MOTOR: 1, PAINEL: 2}
+# Fração do balde que cada prioridade deixa livre: leituras nunca consomem o que sobra para ordens
+RESERVA = {ORDEM: 0.0, MOTOR: 0.1, PAINEL: 0.3}
+
+ESCRITA = {"order_market_buy", "order_market_sell", "order_limit_buy", "order_limit_sell",
+           "create_order", "create_test_order", "cancel_order"}
+
+
+class LimiteExcedido(Exception):
+    pass
+
+
+def configurar_sessao(client, conexoes=20):
+    # Pool de conexões keep-alive do tamanho do pool de workers (o padrão do requests é 10 e descarta o resto)
+    sessao = getattr(client, "session", None)
+    if sessao is None:
+        return
+    from requests.adapters import HTTPAdapter
+    adapter = HTTPAdapter(pool_connections=conexoes, pool_maxsize=conexoes)
+    sessao.mount("https://", adapter)
+    sessao.mount("http://", adapter)
+
+
+class Gateway:
+    # Camada na frente do Client da Binance:
+    # - balde de tokens no peso das requisições (limite por minuto com margem), com fila por prioridade:
+    #   ordens passam à frente do motor, que passa à frente do painel;
+    # - o peso usado informado pela Binance (X-MBX-USED-WEIGHT-1M) corrige o balde, então painel e motor
+    #   em processos separados enxergam o mesmo orçamento do IP;
+    # - leituras idênticas em andamento viram uma única chamada (as outras threads recebem o mesmo resultado);
+    # - 429/418 bloqueiam novas chamadas até o Retry-After.
+    def __init__(self, client, prioridade=MOTOR, limite_peso=6000, margem=0.9, max_espera=30, conexoes=20, metricas=None):
+        self.client = client
+        self.prioridade = prioridade
+        self.limite_peso = limite_peso
+        self.capacidade = limite_peso * margem
+        self.por_segundo = self.capacidade / 60
+        self.max_espera = max_espera
+        self.metricas = metricas
+        self.tokens = self.capacidade
+        self.peso_usado = 0
+        self.bloqueado_ate = 0.
+        self.coalescidas = 0
+        self._atualizado = time.monotonic()
+        self._cond = threading.Condition()
+        self._fila = []
+        self._seq = itertools.count()
+        self._em_voo = {}
+        self._lock_voo = threading.Lock()
+        # Cabeçalhos da última resposta de cada thread: client.response é compartilhado entre as threads
+        self._local = threading.local()
+        configurar_sessao(client, conexoes)
+        sessao = getattr(client, "session", None)
+        if sessao is not None:
+            sessao.hooks["response"].append(self._guardar_headers)
+
+    def _guardar_headers(self, resposta, *args, **kwargs):
+        self._local.headers = resposta.headers
+
+    def _repor(self):
+        agora = time.monotonic()
+        self.tokens = min(self.capacidade, self.tokens + (agora - self._atualizado) * self.por_segundo)
+        self._atualizado = agora
+
+    def _adquirir(self, peso, prioridade):
+        inicio = time.monotonic()
+        reserva = RESERVA[prioridade] * self.capacidade
+        with self._cond:
+            senha = (NIVEIS[prioridade], next(self._seq))
+            heapq.heappush(self._fila, senha)
+            try:
+                while True:
+                    self._repor()
+                    agora = time.monotonic()
+                    bloqueio = self.bloqueado_ate - agora
+                    if bloqueio > self.max_espera:
+                        raise LimiteExcedido(f"Binance bloqueou as requisições por mais {bloqueio:.0f}s")
+                    if self._fila[0] == senha and bloqueio <= 0 and self.tokens - peso >= reserva:
+                        self.tokens -= peso
+                        break
+                    restante = inicio + self.max_espera - agora
+                    if restante <= 0:
+                        raise LimiteExcedido(f"Sem peso disponível para a requisição ({prioridade}) em {self.max_espera}s")
+                    falta = (peso + reserva - self.tokens) / self.por_segundo
+                    self._cond.wait(min(restante, max(falta, bloqueio, 0.01)))
+            finally:
+                self._fila.remove(senha)
+                heapq.heapify(self._fila)
+                self._cond.notify_all()
+        if self.metricas:
+            self.metricas.observar(f"fila:{prioridade}", time.monotonic() - inicio)
+
+    def _registrar_resposta(self, headers, status=None):
+        headers = headers or {}
+        usado = headers.get("x-mbx-used-weight-1m") or headers.get("x-mbx-used-weight")
+        with self._cond:
+            if usado is not None:
+                self.peso_usado = int(usado)
+                self._repor()
+                self.tokens = min(self.tokens, self.capacidade - self.peso_usado)
+            if status in (418, 429):
+                espera = int(headers.get("retry-after") or headers.get("Retry-After") or 60)
+                self.bloqueado_ate = max(self.bloqueado_ate, time.monotonic() + espera)
+            self._cond.notify_all()
+        if self.metricas:
+            self.metricas.definir("rest_peso_usado", self.peso_usado)
+
+    def chamar(self, nome, *args, prioridade=None, **kwargs):
+        metodo = getattr(self.client, nome)
+        if nome in ESCRITA:
+            return self._executar(metodo, nome, args, kwargs, ORDEM)
+        try:
+            chave = (nome, args, tuple(sorted(kwargs.items())))
+            hash(chave)
+        except TypeError:
+            return self._executar(metodo, nome, args, kwargs, prioridade or self.prioridade)
+        with self._lock_voo:
+            futuro = self._em_voo.get(chave)
+            dono = futuro is None
+            if dono:
+                futuro = self._em_voo[chave] = Future()
+        if not dono:
+            self.coalescidas += 1
+            if self.metricas:
+                self.metricas.contar("rest_coalescidas", metodo=nome)
+            return futuro.result()
+        try:
+            resultado = self._executar(metodo, nome, args, kwargs, prioridade or self.prioridade)
+            futuro.set_result(resultado)
+            return resultado
+        except BaseException as e:
+            futuro.set_exception(e)
+            raise
+        finally:
+            with self._lock_voo:
+                del self._em_voo[chave]
+
+    def _executar(self, metodo, nome, args, kwargs, prioridade):
+        self._adquirir(peso_rest(nome, kwargs), prioridade)
+        self._local.headers = None
+        try:
+            resultado = metodo(*args, **kwargs)
+        except Exception as e:
+            # BinanceAPIException traz a própria resposta (com Retry-After)
+            resposta = getattr(e, "response", None)
+            self._registrar_resposta(getattr(resposta, "headers", None) or self._local.headers, getattr(e, "status_code", None))
+            raise
+        self._registrar_resposta(self._local.headers)
+        return resultado
+
+    def __getattr__(self, nome):
+        atributo = getattr(self.client, nome)
+        if not callable(atributo) or nome.startswith("_"):
+            return atributo
+        return lambda *args, **kwargs: self.chamar(nome, *args, **kwargs)
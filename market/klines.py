@@ -0,0 +1,139 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Um candle por linha; mesmos campos da resposta de /api/v3/klines que o robô usa.
+KLINE_DTYPE = np.dtype([
+    ("open_time", "i8"),
+    ("open", "f8"),
+    ("high", "f8"),
+    ("low", "f8"),
+    ("close", "f8"),
+    ("volume", "f8"),
+    ("close_time", "i8"),
+])
+
+INTERVAL_MS = {
+    "1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000,
+    "1h": 3_600_000, "2h": 7_200_000, "4h": 14_400_000, "6h": 21_600_000,
+    "8h": 28_800_000, "12h": 43_200_000, "1d": 86_400_000,
+}
+
+MAX_LIMIT = 1000
+
+
+def klines_to_array(klines):
+    return np.array(
+        [(int(k[0]), float(k[1]), float(k[2]), float(k[3]), float(k[4]), float(k[5]), int(k[6])) for k in klines],
+        dtype=KLINE_DTYPE,
+    )
+
+
+def merge_klines(series, novos, max_candles):
+    # Candles novos substituem os já guardados a partir do primeiro open_time recebido
+    # (o último candle guardado normalmente ainda estava aberto).
+    if series is None or len(series) == 0:
+        merged = novos
+    elif len(novos) == 0:
+        merged = series
+    else:
+        merged = np.concatenate([series[series["open_time"] < novos["open_time"][0]], novos])
+    return merged[-max_candles:]
+
+
+class KlineStore:
+    # Cache de klines em memória + disco por (symbol, interval).
+    # Depois do primeiro download só busca os candles posteriores ao último guardado.
+    def __init__(self, cache_dir="cache/klines", max_candles=1000, max_series=500, ttl=5):
+        self.cache_dir = cache_dir
+        self.max_candles = max_candles
+        self.max_series = max_series
+        self.ttl = ttl
+        self._series = OrderedDict()
+        self._fetched_at = {}
+        self._lock = threading.RLock()
+        self._key_locks = {}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, symbol, interval):
+        return os.path.join(self.cache_dir, f"{symbol}_{interval}.npy")
+
+    def _load(self, key):
+        if key in self._series:
+            self._series.move_to_end(key)
+            return self._series[key]
+        if not self.cache_dir:
+            return None
+        path = self._path(*key)
+        if not os.path.exists(path):
+            return None
+        try:
+            series = np.load(path)
+        except (OSError, ValueError):
+            return None
+        self._remember(key, series)
+        return series
+
+    def _remember(self, key, series):
+        self._series[key] = series
+        self._series.move_to_end(key)
+        while len(self._series) > self.max_series:
+            old, _ = self._series.popitem(last=False)
+            self._fetched_at.pop(old, None)
+
+    def _save(self, key, series):
+        if not self.cache_dir:
+            return
+        path = self._path(*key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, series)
+        os.replace(tmp, path)
+
+    def series(self, symbol, interval):
+        with self._lock:
+            return self._load((symbol, interval))
+
+    def apply(self, symbol, interval, novos, persist=True, replace=False):
+        key = (symbol, interval)
+        with self._lock:
+            series = merge_klines(None if replace else self._load(key), novos, self.max_candles)
+            self._remember(key, series)
+            if persist:
+                self._save(key, series)
+            return series
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get(self, client, symbol, interval, limit=100, agora_ms=None):
+        # Lock por série: símbolos diferentes podem buscar em paralelo
+        key = (symbol, interval)
+        with self._key_lock(key):
+            series = self.series(symbol, interval)
+            agora = time.time()
+            agora_ms = int(agora * 1000) if agora_ms is None else agora_ms
+            completa = series is not None and len(series) >= limit
+            if completa and agora - self._fetched_at.get(key, 0) < self.ttl:
+                return series[-limit:]
+            ultimo = int(series["open_time"][-1]) if completa else 0
+            if completa and agora_ms - ultimo < MAX_LIMIT * INTERVAL_MS[interval]:
+                # Só os candles a partir do último guardado (inclusive, pois ele ainda podia estar aberto),
+                # com limit do tamanho do que falta: alcançar um candle custa peso 1 em vez de 5
+                faltam = max(agora_ms - ultimo, 0) // INTERVAL_MS[interval] + 2
+                klines = client.get_klines(symbol=symbol, interval=interval, startTime=ultimo, limit=min(faltam, MAX_LIMIT))
+                series = self.apply(symbol, interval, klines_to_array(klines))
+            else:
+                klines = client.get_klines(symbol=symbol, interval=interval, limit=min(limit, MAX_LIMIT))
+                series = self.apply(symbol, interval, klines_to_array(klines), replace=True)
+            self._fetched_at[key] = agora
+            return series[-limit:]
+
+
+def times_of(series):
+    return series["open_time"].astype("datetime64[ms]")
@@ -0,0 +1,47 @@
+import threading
+import time
+
+
+class Portfolio:
+    # Saldos de todos os ativos (um get_account) e preços de todos os pares (um ticker em lote),
+    # guardados por `ttl` segundos para serem lidos por painel, sidebar e motor no mesmo tick.
+    def __init__(self, client, quote="USDT", ttl=10):
+        self.client = client
+        self.quote = quote
+        self.ttl = ttl
+        self.saldos = {}
+        self.precos = {}
+        self.loaded_at = 0
+        self._lock = threading.Lock()
+
+    def snapshot(self, force=False):
+        with self._lock:
+            if force or time.time() - self.loaded_at >= self.ttl:
+                account = self.client.get_account()
+                tickers = self.client.get_all_tickers()
+                self.saldos = {
+                    b['asset']: {"free": float(b['free']), "locked": float(b['locked'])}
+                    for b in account['balances']
+                }
+                self.precos = {t['symbol']: float(t['price']) for t in tickers}
+                self.loaded_at = time.time()
+            return self
+
+    def invalidate(self):
+        self.loaded_at = 0
+
+    def saldo(self, asset):
+        return self.snapshot().saldos.get(asset, {}).get("free", 0.0)
+
+    def preco(self, symbol):
+        return self.snapshot().precos.get(symbol, 0.0)
+
+    def valor(self, asset, quantidade):
+        if asset == self.quote:
+            return quantidade
+        return quantidade * self.preco(f"{asset}{self.quote}")
+
+    def total(self, assets=None):
+        self.snapshot()
+        assets = assets if assets is not None else [a for a, s in self.saldos.items() if s["free"] > 0]
+        return sum(self.valor(asset, self.saldos.get(asset, {}).get("free", 0.0)) for asset in assets)
@@ -0,0 +1,94 @@
+import threading
+
+import numpy as np
+
+from market.klines import INTERVAL_MS, KLINE_DTYPE, MAX_LIMIT
+
+BASE = "1m"
+INTERVALOS = ("5m", "15m", "1h", "4h", "1d")
+
+
+def agregar(series, dur):
+    # Candles de um intervalo menor agrupados pelo início do intervalo `dur` (múltiplo de `dur` desde a época, em UTC)
+    grupos = series["open_time"] // dur
+    inicios = np.flatnonzero(np.r_[True, grupos[1:] != grupos[:-1]])
+    fins = np.r_[inicios[1:], len(series)] - 1
+    out = np.empty(len(inicios), dtype=KLINE_DTYPE)
+    out["open_time"] = grupos[inicios] * dur
+    out["open"] = series["open"][inicios]
+    out["high"] = np.maximum.reduceat(series["high"], inicios)
+    out["low"] = np.minimum.reduceat(series["low"], inicios)
+    out["close"] = series["close"][fins]
+    out["volume"] = np.add.reduceat(series["volume"], inicios)
+    out["close_time"] = out["open_time"] + dur - 1
+    return out
+
+
+class Resampler:
+    # Barras de 5m/15m/1h/4h/1d montadas a partir da série de 1m do KlineStore, gravadas no próprio
+    # store como (symbol, intervalo). Cada candle de 1m fechado entra uma única vez na barra em
+    # andamento (`_acum`); o candle de 1m ainda aberto só é somado à barra exibida.
+    def __init__(self, store, intervalos=INTERVALOS, base=BASE):
+        self.store = store
+        self.base = base
+        self.intervalos = [i for i in intervalos if i != base]
+        self._acum = {}
+        self._ultimo = {}
+        self._lock = threading.Lock()
+
+    def semeado(self, symbol):
+        return symbol in self._ultimo
+
+    def semear(self, client, symbol, agora_ms, limit=100):
+        # Histórico de cada intervalo via REST uma única vez (e o cache em disco do store);
+        # dali em diante tudo sai da série de 1m.
+        base = self.store.get(client, symbol, self.base, MAX_LIMIT, agora_ms)
+        fechados = base[base["close_time"] < agora_ms]
+        if not len(fechados):
+            return
+        ultimo = int(fechados["open_time"][-1])
+        # REST fora do lock: símbolos diferentes semeiam em paralelo e o stream continua atualizando os já semeados
+        todas = {intervalo: self.store.get(client, symbol, intervalo, limit, agora_ms) for intervalo in self.intervalos}
+        with self._lock:
+            for intervalo, series in todas.items():
+                dur = INTERVAL_MS[intervalo]
+                inicio = ultimo // dur * dur
+                if base["open_time"][0] <= inicio:
+                    self._acum[(symbol, intervalo)] = agregar(fechados[fechados["open_time"] >= inicio], dur)
+                else:
+                    # A série de 1m não cobre o começo da barra (ex.: 1d): parte da barra da REST,
+                    # que pode incluir o volume parcial do minuto em andamento na partida.
+                    barra = series[series["open_time"] == inicio]
+                    self._acum[(symbol, intervalo)] = barra.copy() if len(barra) else None
+            self._ultimo[symbol] = ultimo
+        self.atualizar(symbol, agora_ms)
+
+    def atualizar(self, symbol, agora_ms):
+        # Consome os candles de 1m ainda não vistos; chamado pelo motor a cada tick e pelo stream a cada kline
+        base = self.store.series(symbol, self.base)
+        if base is None or not len(base) or not self.semeado(symbol):
+            return
+        with self._lock:
+            novos = base[base["open_time"] > self._ultimo[symbol]]
+            n_fechados = int(np.searchsorted(novos["close_time"], agora_ms))
+            fechados, aberto = novos[:n_fechados], novos[n_fechados:]
+            for intervalo in self.intervalos:
+                self._avancar(symbol, intervalo, fechados, aberto)
+            if len(fechados):
+                self._ultimo[symbol] = int(fechados["open_time"][-1])
+
+    def _avancar(self, symbol, intervalo, fechados, aberto):
+        dur = INTERVAL_MS[intervalo]
+        acum = self._acum.get((symbol, intervalo))
+        barras = np.empty(0, dtype=KLINE_DTYPE)
+        if len(fechados):
+            # A barra acumulada entra como um candle a mais do mesmo grupo
+            barras = agregar(fechados if acum is None else np.concatenate([acum, fechados]), dur)
+            acum = self._acum[(symbol, intervalo)] = barras[-1:]
+            barras = barras[:-1]
+        if acum is not None or len(aberto):
+            em_andamento = [p for p in (acum, aberto) if p is not None and len(p)]
+            barras = np.concatenate([barras, agregar(np.concatenate(em_andamento), dur)])
+        if len(barras):
+            # Só grava em disco quando alguma barra fechou
+            self.store.apply(symbol, intervalo, barras, persist=len(fechados) > 0 and len(barras) > 1)
@@ -0,0 +1,390 @@
+# market/simulator.py - Corretora simulada com a mesma interface do binance.client.Client que o robô usa.
+# Preços sintéticos (determinísticos por símbolo e horário) ou klines gravados; latência e limite de
+# peso por minuto configuráveis. Ordens a mercado são executadas no preço atual, com taxa em USDT.
+#
+#   ROBO_SIMULADOR=1 streamlit run main.py                 # dados sintéticos
+#   ROBO_SIMULADOR=dados/ python engine.py                 # replay de dados/SYMBOL_intervalo.csv
+#   python -m market.simulator --symbols 300 --ticks 20    # teste de carga do motor
+
+import argparse
+import glob
+import math
+import os
+import tempfile
+import threading
+import time
+import types
+import zlib
+from collections import deque
+
+import numpy as np
+
+from market.klines import INTERVAL_MS, KLINE_DTYPE
+from market.resampler import agregar
+from monitor.metrics import peso_rest
+
+SYMBOLS_PADRAO = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT", "ADAUSDT", "BNBUSDT", "SHIBUSDT"]
+
+# Componentes do preço sintético: períodos de 2h a 30 dias
+PERIODOS_MS = np.array([2, 7, 26, 80, 240, 720], dtype=float) * 3_600_000
+AMOSTRAS_CANDLE = 8
+
+
+class SimExchangeError(Exception):
+    # Mesmos códigos de erro da API da Binance
+    def __init__(self, code, message, status_code=400, response=None):
+        super().__init__(f"APIError(code={code}): {message}")
+        self.code = code
+        self.message = message
+        self.status_code = status_code
+        self.response = response
+
+
+class _Sessao:
+    # Só o que o Gateway usa de requests.Session: hooks de resposta (chamados na thread da requisição)
+    def __init__(self):
+        self.hooks = {"response": []}
+
+    def mount(self, prefixo, adapter):
+        pass
+
+    def responder(self, resposta):
+        for hook in self.hooks["response"]:
+            hook(resposta)
+
+
+class Relogio:
+    # Horário simulado (ms): anda com o relógio real multiplicado por `velocidade` e pode ser adiantado
+    def __init__(self, inicio_ms=None, velocidade=1.0):
+        self.inicio_ms = int(time.time() * 1000) if inicio_ms is None else int(inicio_ms)
+        self.velocidade = velocidade
+        self._t0 = time.monotonic()
+        self._offset = 0
+
+    def agora(self):
+        return self.inicio_ms + self._offset + int((time.monotonic() - self._t0) * 1000 * self.velocidade)
+
+    def avancar(self, ms):
+        self._offset += int(ms)
+
+
+def _semente(symbol, semente):
+    return zlib.crc32(symbol.encode()) ^ semente
+
+
+def _formatar(valor):
+    return f"{valor:.8f}"
+
+
+class SimClient:
+    def __init__(self, dados=None, symbols=None, saldos=None, relogio=None, latencia=0.0, jitter=0.0,
+                 limite_peso=6000, taxa=0.001, semente=0):
+        # dados: dict symbol -> array KLINE_DTYPE gravado (None = preços sintéticos)
+        self.dados = dados
+        self.symbols = list(dados) if dados else list(symbols or SYMBOLS_PADRAO)
+        self.saldos = {"USDT": 10_000.0, **(saldos or {})}
+        self.latencia = latencia
+        self.jitter = jitter
+        self.limite_peso = limite_peso
+        self.taxa = taxa
+        self.semente = semente
+        if relogio is None and dados:
+            # Replay: começa com 500 candles de histórico disponíveis
+            relogio = Relogio(min(int(s["open_time"][min(500, len(s) - 1)]) for s in dados.values()))
+        self.relogio = relogio or Relogio()
+        self.ordens = []
+        self.response = types.SimpleNamespace(headers={}, status_code=200)
+        self.session = _Sessao()
+        self._componentes = {}
+        self._pesos = deque()
+        self._peso_usado = 0
+        self._lock = threading.Lock()
+        self._rng = np.random.default_rng(semente)
+
+    # --- preços ---
+
+    def _params(self, symbol):
+        params = self._componentes.get(symbol)
+        if params is None:
+            rng = np.random.default_rng(_semente(symbol, self.semente))
+            base = 10 ** rng.uniform(-2, 4.5) if symbol != "BTCUSDT" else 100_000.0
+            params = self._componentes[symbol] = {
+                "base": base,
+                "amplitudes": rng.uniform(0.002, 0.01, len(PERIODOS_MS)) * np.sqrt(PERIODOS_MS / PERIODOS_MS[0]),
+                "fases": rng.uniform(0, 2 * np.pi, len(PERIODOS_MS)),
+                "ruido": rng.uniform(0, 1000),
+            }
+        return params
+
+    def _preco_sintetico(self, symbol, t):
+        p = self._params(symbol)
+        t = np.asarray(t, dtype=float)
+        onda = (p["amplitudes"] * np.sin(2 * np.pi * t[..., None] / PERIODOS_MS + p["fases"])).sum(axis=-1)
+        ruido = np.modf(np.sin(np.floor(t / 60_000) * 12.9898 + p["ruido"]) * 43758.5453)[0]
+        return p["base"] * np.exp(onda + 0.001 * ruido)
+
+    def _klines_sinteticos(self, symbol, dur, abertos, agora):
+        amostras = abertos[:, None] + dur * np.arange(AMOSTRAS_CANDLE + 1) / AMOSTRAS_CANDLE
+        amostras = np.minimum(amostras, agora)
+        precos = self._preco_sintetico(symbol, amostras)
+        out = np.empty(len(abertos), dtype=KLINE_DTYPE)
+        out["open_time"] = abertos
+        out["open"] = precos[:, 0]
+        out["high"] = precos.max(axis=1)
+        out["low"] = precos.min(axis=1)
+        out["close"] = precos[:, -1]
+        out["volume"] = np.abs(np.diff(np.log(precos), axis=1)).sum(axis=1) * 1e5 / np.sqrt(self._params(symbol)["base"])
+        out["close_time"] = abertos + dur - 1
+        return out
+
+    def _serie(self, symbol, interval, limit=500, startTime=None, endTime=None):
+        if not symbol.endswith("USDT") or (self.dados is not None and symbol not in self.dados):
+            raise SimExchangeError(-1121, "Invalid symbol.")
+        dur = INTERVAL_MS[interval]
+        agora = self.relogio.agora()
+        limit = min(int(limit), 1000)
+        if self.dados is None:
+            ultimo = agora // dur * dur
+            if endTime is not None:
+                ultimo = min(ultimo, int(endTime) // dur * dur)
+            if startTime is not None:
+                primeiro = -(-int(startTime) // dur) * dur
+                abertos = np.arange(primeiro, min(ultimo, primeiro + (limit - 1) * dur) + 1, dur, dtype=np.int64)
+            else:
+                abertos = ultimo - dur * np.arange(limit - 1, -1, -1, dtype=np.int64)
+            return self._klines_sinteticos(symbol, dur, abertos, agora)
+        series = self.dados[symbol]
+        series = series[series["open_time"] <= agora]
+        base = int(series["open_time"][1] - series["open_time"][0]) if len(series) > 1 else dur
+        if dur > base:
+            desde = int(startTime) // dur * dur if startTime is not None else (agora // dur - limit) * dur
+            series = agregar(series[series["open_time"] >= desde], dur)
+        if endTime is not None:
+            series = series[series["open_time"] <= int(endTime)]
+        if startTime is not None:
+            return series[series["open_time"] >= int(startTime)][:limit]
+        return series[-limit:]
+
+    def _preco(self, symbol):
+        if not symbol.endswith("USDT") or (self.dados is not None and symbol not in self.dados):
+            raise SimExchangeError(-1121, "Invalid symbol.")
+        if self.dados is None:
+            return float(self._preco_sintetico(symbol, self.relogio.agora()))
+        series = self.dados[symbol]
+        return float(series["close"][max(np.searchsorted(series["open_time"], self.relogio.agora(), "right") - 1, 0)])
+
+    def _filtros(self, symbol):
+        referencia = self._params(symbol)["base"] if self.dados is None else float(self.dados[symbol]["close"][0])
+        step = min(1.0, max(1e-8, 10 ** math.floor(math.log10(0.1 / referencia))))
+        tick = min(1.0, max(1e-8, 10 ** (math.floor(math.log10(referencia)) - 5)))
+        return step, tick
+
+    # --- limites e latência ---
+
+    def _chamada(self, metodo, kwargs=None):
+        peso = peso_rest(metodo, kwargs or {})
+        with self._lock:
+            agora = time.monotonic()
+            while self._pesos and self._pesos[0][0] <= agora - 60:
+                self._peso_usado -= self._pesos.popleft()[1]
+            if self.limite_peso and self._peso_usado + peso > self.limite_peso:
+                resposta = self.response = types.SimpleNamespace(status_code=429, headers={"x-mbx-used-weight-1m": str(self._peso_usado), "Retry-After": "60"})
+                self.session.responder(resposta)
+                raise SimExchangeError(-1003, f"Too much request weight used; current limit is {self.limite_peso} request weight per 1 MINUTE.", 429, resposta)
+            self._pesos.append((agora, peso))
+            self._peso_usado += peso
+            resposta = self.response = types.SimpleNamespace(status_code=200, headers={"x-mbx-used-weight": str(self._peso_usado), "x-mbx-used-weight-1m": str(self._peso_usado)})
+            espera = self.latencia + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        self.session.responder(resposta)
+        if espera > 0:
+            time.sleep(espera)
+
+    # --- interface do binance.client.Client ---
+
+    def ping(self):
+        self._chamada("ping")
+        return {}
+
+    def get_server_time(self):
+        self._chamada("ping")
+        return {"serverTime": self.relogio.agora()}
+
+    def get_klines(self, **params):
+        self._chamada("get_klines", params)
+        series = self._serie(params["symbol"], params["interval"], params.get("limit", 500), params.get("startTime"), params.get("endTime"))
+        return [[int(k["open_time"]), _formatar(k["open"]), _formatar(k["high"]), _formatar(k["low"]), _formatar(k["close"]),
+                 _formatar(k["volume"]), int(k["close_time"]), _formatar(k["volume"] * k["close"]), 0, "0", "0", "0"]
+                for k in series]
+
+    def get_symbol_ticker(self, **params):
+        self._chamada("get_symbol_ticker" if "symbol" in params else "get_all_tickers")
+        if "symbol" in params:
+            return {"symbol": params["symbol"], "price": _formatar(self._preco(params["symbol"]))}
+        return [{"symbol": s, "price": _formatar(self._preco(s))} for s in self.symbols]
+
+    def get_all_tickers(self):
+        return self.get_symbol_ticker()
+
+    def _symbol_info(self, symbol):
+        step, tick = self._filtros(symbol)
+        return {
+            "symbol": symbol,
+            "status": "TRADING",
+            "baseAsset": symbol[:-4],
+            "quoteAsset": "USDT",
+            "filters": [
+                {"filterType": "PRICE_FILTER", "minPrice": _formatar(tick), "maxPrice": "1000000.00000000", "tickSize": _formatar(tick)},
+                {"filterType": "LOT_SIZE", "minQty": _formatar(step), "maxQty": "9000000000.00000000", "stepSize": _formatar(step)},
+                {"filterType": "NOTIONAL", "minNotional": "5.00000000", "applyMinToMarket": True},
+            ],
+        }
+
+    def get_exchange_info(self):
+        self._chamada("get_exchange_info")
+        return {"timezone": "UTC", "serverTime": self.relogio.agora(),
+                "rateLimits": [{"rateLimitType": "REQUEST_WEIGHT", "interval": "MINUTE", "intervalNum": 1, "limit": self.limite_peso}],
+                "symbols": [self._symbol_info(s) for s in self.symbols]}
+
+    def get_symbol_info(self, symbol):
+        self._chamada("get_symbol_info")
+        if symbol not in self.symbols:
+            return None
+        return self._symbol_info(symbol)
+
+    def get_account(self):
+        self._chamada("get_account")
+        with self._lock:
+            return {"canTrade": True, "accountType": "SPOT", "balances": [
+                {"asset": a, "free": _formatar(q), "locked": "0.00000000"} for a, q in self.saldos.items()]}
+
+    def get_asset_balance(self, asset):
+        self._chamada("get_asset_balance")
+        with self._lock:
+            return {"asset": asset, "free": _formatar(self.saldos.get(asset, 0.0)), "locked": "0.00000000"}
+
+    def create_order(self, **params):
+        self._chamada("create_order")
+        symbol, lado = params["symbol"], params["side"]
+        if symbol not in self.symbols:
+            if self.dados is not None:
+                raise SimExchangeError(-1121, "Invalid symbol.")
+            self.symbols.append(symbol)
+        preco = self._preco(symbol)
+        step, _ = self._filtros(symbol)
+        if "quoteOrderQty" in params:
+            quantidade = math.floor(float(params["quoteOrderQty"]) / preco / step + 1e-9) * step
+        else:
+            quantidade = float(params["quantity"])
+        if quantidade < step or abs(quantidade / step - round(quantidade / step)) > 1e-6:
+            raise SimExchangeError(-1013, "Filter failure: LOT_SIZE")
+        if quantidade * preco < 5:
+            raise SimExchangeError(-1013, "Filter failure: NOTIONAL")
+        base = symbol[:-4]
+        bruto = quantidade * preco
+        comissao = bruto * self.taxa
+        with self._lock:
+            if lado == "BUY":
+                if self.saldos.get("USDT", 0.0) < bruto + comissao:
+                    raise SimExchangeError(-2010, "Account has insufficient balance for requested action.")
+                self.saldos["USDT"] -= bruto + comissao
+                self.saldos[base] = self.saldos.get(base, 0.0) + quantidade
+            else:
+                if self.saldos.get(base, 0.0) < quantidade - 1e-12:
+                    raise SimExchangeError(-2010, "Account has insufficient balance for requested action.")
+                self.saldos[base] -= quantidade
+                self.saldos["USDT"] = self.saldos.get("USDT", 0.0) + bruto - comissao
+            ordem = {
+                "symbol": symbol,
+                "orderId": len(self.ordens) + 1,
+                "transactTime": self.relogio.agora(),
+                "side": lado,
+                "type": "MARKET",
+                "status": "FILLED",
+                "origQty": _formatar(quantidade),
+                "executedQty": _formatar(quantidade),
+                "cummulativeQuoteQty": _formatar(bruto),
+                "fills": [{"price": _formatar(preco), "qty": _formatar(quantidade), "commission": _formatar(comissao), "commissionAsset": "USDT"}],
+            }
+            self.ordens.append(ordem)
+        return ordem
+
+    def order_market_buy(self, **params):
+        return self.create_order(side="BUY", type="MARKET", **params)
+
+    def order_market_sell(self, **params):
+        return self.create_order(side="SELL", type="MARKET", **params)
+
+
+def carregar_pasta(pasta):
+    # dados/SYMBOL_intervalo.csv|parquet -> dict symbol -> array KLINE_DTYPE
+    from backtest.backtester import carregar_klines
+    dados = {}
+    for path in sorted(glob.glob(os.path.join(pasta, "*.csv")) + glob.glob(os.path.join(pasta, "*.parquet"))):
+        df = carregar_klines(path)
+        series = np.empty(len(df), dtype=KLINE_DTYPE)
+        for campo in ("open_time", "open", "high", "low", "close", "volume"):
+            series[campo] = df[campo].to_numpy()
+        passo = int(np.median(np.diff(series["open_time"]))) if len(series) > 1 else 60_000
+        series["close_time"] = series["open_time"] + passo - 1
+        dados[os.path.basename(path).split("_")[0].split(".")[0]] = series
+    return dados
+
+
+def criar_client(api_key=None, api_secret=None, **kwargs):
+    # Com ROBO_SIMULADOR definido (1 = sintético, ou uma pasta de klines) devolve o SimClient
+    origem = os.getenv("ROBO_SIMULADOR")
+    if not origem:
+        from binance.client import Client
+        return Client(api_key, api_secret, **kwargs)
+    dados = carregar_pasta(origem) if os.path.isdir(origem) else None
+    inicio = min(int(s["open_time"][min(500, len(s) - 1)]) for s in dados.values()) if dados else None
+    return SimClient(
+        dados,
+        relogio=Relogio(inicio, velocidade=float(os.getenv("SIMULADOR_VELOCIDADE", "1"))),
+        saldos={"USDT": float(os.getenv("SIMULADOR_SALDO", "10000"))},
+        latencia=float(os.getenv("SIMULADOR_LATENCIA_MS", "0")) / 1000,
+    )
+
+
+def main():
+    # Motor completo (pool, indicadores, ordens, trade store) contra a corretora simulada,
+    # um candle por tick com o relógio parado entre os ticks
+    parser = argparse.ArgumentParser(description="Teste de carga do motor com a corretora simulada")
+    parser.add_argument("--symbols", type=int, default=100)
+    parser.add_argument("--ticks", type=int, default=10)
+    parser.add_argument("--intervalo", default="15m")
+    parser.add_argument("--latencia-ms", type=float, default=50)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    from engine import DEFAULT_CONFIG, Engine
+    from market.klines import KlineStore
+    from monitor.metrics import Metrics
+    from trading.trade_store import TradeStore
+
+    symbols = [f"SIM{i:03d}USDT" for i in range(args.symbols)]
+    dur = INTERVAL_MS[args.intervalo]
+    relogio = Relogio(int(time.time() * 1000) // dur * dur + 2000, velocidade=0)
+    sim = SimClient(symbols=symbols, relogio=relogio, saldos={"USDT": 1_000_000.0},
+                    latencia=args.latencia_ms / 1000, limite_peso=None)
+    cfg = {**DEFAULT_CONFIG, "symbols": symbols, "intervalo": args.intervalo, "usar_websocket": False,
+           "max_workers": args.workers, "timeout_symbol": 600}
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = Engine(sim, store=KlineStore(cache_dir=None, max_series=len(symbols) + 10, ttl=0),
+                        trades=TradeStore(os.path.join(tmp, "operacoes.db")), metricas=Metrics())
+        engine.exchange_info.refresh()
+        for tick in range(args.ticks):
+            inicio = time.perf_counter()
+            # {estratégia: {symbol: resultado}} -> lista de todos os resultados
+            resultados = [r for por_symbol in engine.executar_trade(cfg, relogio.agora()).values() for r in por_symbol.values()]
+            print(f"tick {tick + 1:>3}: {time.perf_counter() - inicio:6.2f}s  "
+                  f"compras={resultados.count('COMPRA')} vendas={resultados.count('VENDA')} "
+                  f"erros={resultados.count('erro') + resultados.count('timeout')}")
+            relogio.avancar(dur)
+        engine.pool.shutdown()
+        for etapa in engine.metricas.resumo()["etapas"]:
+            print(f"{etapa['etapa']:>24}: n={etapa['n']:<6} média={etapa['media_ms']:8.2f}ms  p95={etapa['p95_ms']:8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import asyncio
+import json
+import threading
+import time
+
+import numpy as np
+
+from market.klines import INTERVAL_MS, KLINE_DTYPE, MAX_LIMIT, klines_to_array
+
+STREAM_URL = "wss://stream.binance.com:9443/stream?streams="
+
+
+def stream_names(symbols, interval):
+    nomes = []
+    for symbol in symbols:
+        nomes.append(f"{symbol.lower()}@kline_{interval}")
+        nomes.append(f"{symbol.lower()}@ticker")
+    return nomes
+
+
+async def websocket_feed(url, reconnect_delay=1, max_delay=60):
+    import websockets
+
+    delay = reconnect_delay
+    while True:
+        try:
+            async with websockets.connect(url, ping_interval=20) as ws:
+                delay = reconnect_delay
+                async for raw in ws:
+                    yield raw
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_delay)
+
+
+async def replay_feed(messages, delay=0):
+    # Feed local para testes: mensagens no formato do combined stream (dict ou JSON).
+    for msg in messages:
+        yield msg if isinstance(msg, str) else json.dumps(msg)
+        await asyncio.sleep(delay)
+
+
+def replay_file(path, delay=0):
+    with open(path) as f:
+        messages = [line for line in f if line.strip()]
+    return replay_feed(messages, delay)
+
+
+class MarketStream:
+    # Ingestão dos streams combinados de kline/ticker da Binance numa thread com loop asyncio próprio.
+    # Os candles vão para o KlineStore (persistidos quando fecham) e o último preço fica em `prices`.
+    def __init__(self, symbols, interval, store, feed=None, stale_after=90, client=None, retry_after=10):
+        self.symbols = list(symbols)
+        self.interval = interval
+        self.store = store
+        self.feed = feed
+        self.stale_after = stale_after
+        self.client = client
+        self.retry_after = retry_after
+        self.prices = {}
+        self.updated_at = {}
+        self.callbacks = []
+        # (symbol, interval) -> (open_time do último candle antes do buraco, próxima tentativa)
+        self._lacunas = {}
+        self._thread = None
+        self._loop = None
+        self._task = None
+
+    def on_kline(self, callback):
+        # callback(symbol, interval, candle, fechado)
+        self.callbacks.append(callback)
+
+    def handle(self, raw):
+        msg = json.loads(raw) if isinstance(raw, (str, bytes)) else raw
+        data = msg.get("data", msg)
+        evento = data.get("e")
+        agora = time.time()
+        if evento == "kline":
+            k = data["k"]
+            symbol = data["s"]
+            candle = np.array([(int(k["t"]), float(k["o"]), float(k["h"]), float(k["l"]),
+                                float(k["c"]), float(k["v"]), int(k["T"]))], dtype=KLINE_DTYPE)
+            self.preencher(symbol, k["i"], int(k["t"]))
+            self.store.apply(symbol, k["i"], candle, persist=bool(k["x"]))
+            self.prices[symbol] = float(k["c"])
+            self.updated_at[symbol] = agora
+            for callback in self.callbacks:
+                callback(symbol, k["i"], candle[0], bool(k["x"]))
+        elif evento == "24hrTicker":
+            self.prices[data["s"]] = float(data["c"])
+            self.updated_at[data["s"]] = agora
+
+    def preencher(self, symbol, interval, aberto):
+        # Depois de uma reconexão o candle recebido pode pular vários: os que faltam vêm via REST antes de aplicar
+        # o novo (a busca incremental do KlineStore só pede candles depois do último guardado, nunca o buraco).
+        chave = (symbol, interval)
+        passo = INTERVAL_MS.get(interval)
+        series = self.store.series(symbol, interval)
+        if self.client is None or passo is None or series is None or not len(series):
+            return
+        inicio, tentar_em = self._lacunas.get(chave, (None, 0))
+        if inicio is None:
+            inicio = int(series["open_time"][-1])
+            if aberto <= inicio + passo:
+                return
+        elif time.time() < tentar_em:
+            return
+        try:
+            klines = self.client.get_klines(symbol=symbol, interval=interval, startTime=max(inicio, aberto - MAX_LIMIT * passo),
+                                            endTime=aberto - 1, limit=MAX_LIMIT)
+        except Exception:
+            # Fica pendente: tenta de novo numa próxima mensagem do símbolo
+            self._lacunas[chave] = (inicio, time.time() + self.retry_after)
+            return
+        self._lacunas.pop(chave, None)
+        novos = klines_to_array(klines)
+        if len(novos):
+            # Mantém os candles do stream que já chegaram depois do buraco
+            self.store.apply(symbol, interval, np.concatenate([novos, series[series["open_time"] > novos["open_time"][-1]]]))
+
+    async def run(self):
+        feed = self.feed if self.feed is not None else websocket_feed(STREAM_URL + "/".join(stream_names(self.symbols, self.interval)))
+        async for raw in feed:
+            try:
+                self.handle(raw)
+            except (KeyError, ValueError, TypeError):
+                continue
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return self
+        self._thread = threading.Thread(target=self._run_thread, name=f"market-stream-{self.interval}", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run_thread(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._task = self._loop.create_task(self.run())
+        try:
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop.close()
+
+    def stop(self):
+        if self._loop and self._task and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._task.cancel)
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def warm(self, client, limit=100):
+        # Histórico inicial via REST (uma vez); dali em diante o stream mantém os buffers
+        # e o mesmo client preenche os buracos deixados por reconexões.
+        self.client = client
+        for symbol in self.symbols:
+            self.store.get(client, symbol, self.interval, limit)
+
+    def fresh(self, symbol):
+        return time.time() - self.updated_at.get(symbol, 0) < self.stale_after
+
+    def price(self, symbol):
+        return self.prices.get(symbol) if self.fresh(symbol) else None
+
+    def klines(self, symbol, limit=100):
+        if not self.fresh(symbol):
+            return None
+        series = self.store.series(symbol, self.interval)
+        if series is None or len(series) < limit:
+            return None
+        return series[-limit:]
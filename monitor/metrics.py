@@ -0,0 +1,196 @@
+import bisect
+import contextlib
+import http.server
+import threading
+import time
+
+# Limites dos buckets de latência (segundos)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Peso de cada endpoint REST da Binance (limite de 6000/min por IP)
+PESOS_REST = {
+    "get_account": 20,
+    "get_asset_balance": 20,
+    "get_all_tickers": 4,
+    "get_symbol_ticker": 2,
+    "get_exchange_info": 20,
+    "get_symbol_info": 20,
+    "order_market_buy": 1,
+    "order_market_sell": 1,
+    "create_order": 1,
+    "ping": 1,
+}
+
+_NULO = contextlib.nullcontext()
+
+
+def peso_rest(metodo, kwargs):
+    if metodo in ("get_klines", "get_historical_klines"):
+        limit = kwargs.get("limit", 500)
+        return 1 if limit < 100 else 2 if limit < 500 else 5 if limit <= 1000 else 10
+    return PESOS_REST.get(metodo, 1)
+
+
+class _Span:
+    __slots__ = ("metricas", "etapa", "inicio")
+
+    def __init__(self, metricas, etapa):
+        self.metricas = metricas
+        self.etapa = etapa
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, *_):
+        self.metricas.observar(self.etapa, time.perf_counter() - self.inicio)
+        if tipo is not None:
+            self.metricas.contar("erros", etapa=self.etapa)
+        return False
+
+
+class Metrics:
+    # Histogramas de latência por etapa e contadores (chamadas REST, peso, erros).
+    # Desligado, `span` devolve um contexto vazio compartilhado e nada é registrado.
+    def __init__(self, ativo=True, prefixo="robo"):
+        self.ativo = ativo
+        self.prefixo = prefixo
+        self.histogramas = {}
+        self.contadores = {}
+        self.medidores = {}
+        self._lock = threading.Lock()
+
+    def span(self, etapa):
+        return _Span(self, etapa) if self.ativo else _NULO
+
+    def observar(self, etapa, segundos):
+        if not self.ativo:
+            return
+        with self._lock:
+            h = self.histogramas.get(etapa)
+            if h is None:
+                h = self.histogramas[etapa] = {"buckets": [0] * (len(BUCKETS) + 1), "soma": 0.0, "n": 0, "max": 0.0}
+            h["buckets"][bisect.bisect_left(BUCKETS, segundos)] += 1
+            h["soma"] += segundos
+            h["n"] += 1
+            h["max"] = max(h["max"], segundos)
+
+    def contar(self, nome, valor=1, **labels):
+        if not self.ativo:
+            return
+        chave = (nome, tuple(sorted(labels.items())))
+        with self._lock:
+            self.contadores[chave] = self.contadores.get(chave, 0) + valor
+
+    def definir(self, nome, valor, **labels):
+        # Valor instantâneo (ex.: peso REST usado no minuto)
+        if not self.ativo:
+            return
+        with self._lock:
+            self.medidores[(nome, tuple(sorted(labels.items())))] = valor
+
+    def limpar(self):
+        with self._lock:
+            self.histogramas.clear()
+            self.contadores.clear()
+            self.medidores.clear()
+
+    def quantil(self, etapa, q):
+        # Estimado pelos buckets (interpolação linear dentro do bucket)
+        h = self.histogramas[etapa]
+        alvo, acumulado, anterior = q * h["n"], 0, 0.0
+        for limite, n in zip(BUCKETS + (h["max"],), h["buckets"]):
+            if n and acumulado + n >= alvo:
+                return min(anterior + (limite - anterior) * (alvo - acumulado) / n, h["max"])
+            acumulado += n
+            anterior = limite
+        return h["max"]
+
+    def resumo(self):
+        # Formato JSON (vai no estado_robo.json para o painel)
+        with self._lock:
+            etapas = [{
+                "etapa": etapa,
+                "n": h["n"],
+                "media_ms": h["soma"] / h["n"] * 1000,
+                "p50_ms": self.quantil(etapa, 0.5) * 1000,
+                "p95_ms": self.quantil(etapa, 0.95) * 1000,
+                "max_ms": h["max"] * 1000,
+            } for etapa, h in sorted(self.histogramas.items())]
+            contadores = [{"nome": nome, **dict(labels), "valor": valor} for (nome, labels), valor in sorted(self.contadores.items())]
+            medidores = [{"nome": nome, **dict(labels), "valor": valor} for (nome, labels), valor in sorted(self.medidores.items())]
+        return {"etapas": etapas, "contadores": contadores, "medidores": medidores}
+
+    def prometheus(self):
+        linhas = []
+        with self._lock:
+            nome = f"{self.prefixo}_etapa_segundos"
+            if self.histogramas:
+                linhas.append(f"# TYPE {nome} histogram")
+            for etapa, h in sorted(self.histogramas.items()):
+                acumulado = 0
+                for limite, n in zip(BUCKETS + ("+Inf",), h["buckets"]):
+                    acumulado += n
+                    linhas.append(f'{nome}_bucket{{etapa="{etapa}",le="{limite}"}} {acumulado}')
+                linhas.append(f'{nome}_sum{{etapa="{etapa}"}} {h["soma"]}')
+                linhas.append(f'{nome}_count{{etapa="{etapa}"}} {h["n"]}')
+            tipos = set()
+            for (contador, labels), valor in sorted(self.contadores.items()):
+                nome = f"{self.prefixo}_{contador}_total"
+                if nome not in tipos:
+                    tipos.add(nome)
+                    linhas.append(f"# TYPE {nome} counter")
+                rotulos = ",".join(f'{k}="{v}"' for k, v in labels)
+                linhas.append(f"{nome}{{{rotulos}}} {valor}" if rotulos else f"{nome} {valor}")
+            for (medidor, labels), valor in sorted(self.medidores.items()):
+                nome = f"{self.prefixo}_{medidor}"
+                if nome not in tipos:
+                    tipos.add(nome)
+                    linhas.append(f"# TYPE {nome} gauge")
+                rotulos = ",".join(f'{k}="{v}"' for k, v in labels)
+                linhas.append(f"{nome}{{{rotulos}}} {valor}" if rotulos else f"{nome} {valor}")
+        return "\n".join(linhas) + "\n"
+
+
+class ClienteMedido:
+    # Envolve o Client da Binance: cada chamada conta chamadas/peso e entra no histograma "rest:<método>"
+    def __init__(self, client, metricas):
+        self.client = client
+        self.metricas = metricas
+
+    def __getattr__(self, nome):
+        atributo = getattr(self.client, nome)
+        if not callable(atributo) or nome.startswith("_"):
+            return atributo
+        metricas = self.metricas
+
+        def chamada(*args, **kwargs):
+            if not metricas.ativo:
+                return atributo(*args, **kwargs)
+            metricas.contar("rest_chamadas", metodo=nome)
+            metricas.contar("rest_peso", peso_rest(nome, kwargs), metodo=nome)
+            with metricas.span(f"rest:{nome}"):
+                return atributo(*args, **kwargs)
+        return chamada
+
+
+def servir(metricas, porta=9108, host="0.0.0.0"):
+    # GET /metrics no formato texto do Prometheus, numa thread daemon
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            corpo = metricas.prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = http.server.ThreadingHTTPServer((host, porta), Handler)
+    threading.Thread(target=servidor.serve_forever, name="metricas", daemon=True).start()
+    return servidor
@@ -1,4 +1,9 @@
+import threading
+
 import numpy as np
+import pandas as pd
+
+# EMA/MACD/RSI abaixo são as versões antigas, mantidas só como referência do benchmark (ver README).
 
 def EMA(prices, period):
     prices = np.array(prices)
@@ -34,3 +39,233 @@ def RSI(prices, period=14):
         rs = up / down if down != 0 else 0
         rsi[i] = 100. - 100. / (1. + rs)
     return rsi
+
+
+# Versões incrementais: cada update() avança um candle em O(1).
+# snapshot()/restore() guardam o estado entre execuções (o motor grava o IndicatorCache em disco).
+# peek() calcula o valor para um candle ainda aberto sem alterar o estado.
+
+class EMAState:
+    def __init__(self, period, value=None, count=0):
+        self.period = period
+        self.alpha = 2. / (period + 1)
+        self.value = value
+        self.count = count
+
+    def peek(self, close):
+        if self.value is None:
+            return float(close)
+        return self.value + self.alpha * (float(close) - self.value)
+
+    def update(self, close):
+        self.value = self.peek(close)
+        self.count += 1
+        return self.value
+
+    def snapshot(self):
+        return {"period": self.period, "value": self.value, "count": self.count}
+
+    @classmethod
+    def restore(cls, snap):
+        return cls(snap["period"], snap["value"], snap["count"])
+
+
+class MACDState:
+    def __init__(self, fast_period=12, slow_period=26, signal_period=9):
+        self.fast = EMAState(fast_period)
+        self.slow = EMAState(slow_period)
+        self.signal = EMAState(signal_period)
+
+    def peek(self, close):
+        macd = self.fast.peek(close) - self.slow.peek(close)
+        signal = self.signal.peek(macd)
+        return macd, signal, macd - signal
+
+    def update(self, close):
+        macd = self.fast.update(close) - self.slow.update(close)
+        signal = self.signal.update(macd)
+        return macd, signal, macd - signal
+
+    @property
+    def count(self):
+        return self.fast.count
+
+    @property
+    def value(self):
+        if self.fast.value is None:
+            return None
+        macd = self.fast.value - self.slow.value
+        return macd, self.signal.value, macd - self.signal.value
+
+    def snapshot(self):
+        return {"fast": self.fast.snapshot(), "slow": self.slow.snapshot(), "signal": self.signal.snapshot()}
+
+    @classmethod
+    def restore(cls, snap):
+        state = cls.__new__(cls)
+        state.fast = EMAState.restore(snap["fast"])
+        state.slow = EMAState.restore(snap["slow"])
+        state.signal = EMAState.restore(snap["signal"])
+        return state
+
+
+class RSIState:
+    # Suavização de Wilder: média simples dos primeiros `period` deltas, depois média móvel 1/period.
+    def __init__(self, period=14):
+        self.period = period
+        self.last_close = None
+        self.avg_up = 0.
+        self.avg_down = 0.
+        self.count = 0
+        self.value = None
+
+    def _avancar(self, close):
+        close = float(close)
+        if self.last_close is None:
+            return 0., 0., 0, None
+        delta = close - self.last_close
+        up, down = max(delta, 0.), -min(delta, 0.)
+        n = self.count
+        if n < self.period:
+            avg_up = (self.avg_up * n + up) / (n + 1)
+            avg_down = (self.avg_down * n + down) / (n + 1)
+        else:
+            avg_up = (self.avg_up * (self.period - 1) + up) / self.period
+            avg_down = (self.avg_down * (self.period - 1) + down) / self.period
+        n += 1
+        if n < self.period:
+            return avg_up, avg_down, n, None
+        if avg_down == 0:
+            return avg_up, avg_down, n, 100. if avg_up > 0 else 50.
+        return avg_up, avg_down, n, 100. - 100. / (1. + avg_up / avg_down)
+
+    def peek(self, close):
+        return self._avancar(close)[3]
+
+    def update(self, close):
+        self.avg_up, self.avg_down, self.count, self.value = self._avancar(close)
+        self.last_close = float(close)
+        return self.value
+
+    def snapshot(self):
+        return {"period": self.period, "last_close": self.last_close, "avg_up": self.avg_up,
+                "avg_down": self.avg_down, "count": self.count, "value": self.value}
+
+    @classmethod
+    def restore(cls, snap):
+        state = cls(snap["period"])
+        state.last_close = snap["last_close"]
+        state.avg_up = snap["avg_up"]
+        state.avg_down = snap["avg_down"]
+        state.count = snap["count"]
+        state.value = snap["value"]
+        return state
+
+
+INDICADORES = {"ema": EMAState, "macd": MACDState, "rsi": RSIState}
+
+
+class IndicatorCache:
+    # Estados incrementais compartilhados por todas as estratégias do motor, um por (symbol, intervalo, indicador),
+    # com indicador = ("ema", 9), ("macd", 12, 26, 9), ("rsi", 14)... Duas estratégias que usam a mesma EMA no
+    # mesmo símbolo/intervalo leem o mesmo estado, e o valor do último candle é guardado até chegar um novo.
+    # Cada (symbol, intervalo) só é avançado por uma thread por vez (o worker do símbolo no motor); o lock
+    # só garante que snapshot() não pegue um estado avançado com o último candle consumido ainda antigo.
+    def __init__(self):
+        self.estados = {}
+        self.calculos = 0
+        self._lock = threading.Lock()
+
+    def valores(self, symbol, intervalo, closes, times, indicadores):
+        # {indicador: (anterior, atual)}: valor no penúltimo candle de `closes` e no último
+        with self._lock:
+            return self._valores(symbol, intervalo, closes, times, indicadores)
+
+    def _valores(self, symbol, intervalo, closes, times, indicadores):
+        marca = (int(times[-1]), float(closes[-1]))
+        primeiro, penultimo = int(times[0]), int(times[-2])
+        novos_desde = {}
+        resultado = {}
+        for indicador in indicadores:
+            chave = (symbol, intervalo, indicador)
+            item = self.estados.get(chave)
+            if item is not None and item[2] == marca:
+                resultado[indicador] = item[3]
+                continue
+            if item is None or (item[1] is not None and item[1] < primeiro):
+                item = [INDICADORES[indicador[0]](*indicador[1:]), None]
+            estado, ultimo = item[0], item[1]
+            # Os candles novos são os mesmos para todos os indicadores que pararam no mesmo candle
+            novos = novos_desde.get(ultimo)
+            if novos is None:
+                inicio = 0 if ultimo is None else int(np.searchsorted(times[:-1], ultimo, side="right"))
+                novos = novos_desde[ultimo] = closes[inicio:-1].tolist()
+            for close in novos:
+                estado.update(close)
+            valor = resultado[indicador] = (estado.value, estado.peek(marca[1]))
+            self.estados[chave] = [estado, penultimo if novos else ultimo, marca, valor]
+            self.calculos += 1
+        return resultado
+
+    def snapshot(self):
+        # Só o estado e o open time do último candle fechado consumido; o valor do candle aberto é recalculado
+        with self._lock:
+            return [[symbol, intervalo, list(indicador), item[0].snapshot(), item[1]]
+                    for (symbol, intervalo, indicador), item in self.estados.items()]
+
+    @classmethod
+    def restore(cls, snap):
+        cache = cls()
+        for symbol, intervalo, indicador, estado, ultimo in snap:
+            indicador = tuple(indicador)
+            cache.estados[(symbol, intervalo, indicador)] = [INDICADORES[indicador[0]].restore(estado), ultimo, None, None]
+        return cache
+
+
+# Versões em lote: `prices` é uma matriz (n_símbolos x n_candles) e cada indicador
+# é calculado para todos os símbolos de uma vez (ewm do pandas roda em C, sem loop Python).
+# Os valores coincidem com os de EMAState/MACDState/RSIState.
+
+def _ewm(matriz, **kwargs):
+    return pd.DataFrame(matriz.T).ewm(adjust=False, **kwargs).mean().to_numpy().T
+
+def EMA_batch(prices, period):
+    return _ewm(np.atleast_2d(np.asarray(prices, dtype=float)), span=period)
+
+def MACD_batch(prices, fast_period=12, slow_period=26, signal_period=9):
+    prices = np.atleast_2d(np.asarray(prices, dtype=float))
+    macd_line = _ewm(prices, span=fast_period) - _ewm(prices, span=slow_period)
+    signal_line = _ewm(macd_line, span=signal_period)
+    return macd_line, signal_line, macd_line - signal_line
+
+def RSI_batch(prices, period=14):
+    prices = np.atleast_2d(np.asarray(prices, dtype=float))
+    rsi = np.full(prices.shape, np.nan)
+    if prices.shape[1] <= period:
+        return rsi
+    deltas = np.diff(prices, axis=1)
+    ups = np.clip(deltas, 0, None)
+    downs = np.clip(-deltas, 0, None)
+    # semente de Wilder: média simples dos primeiros `period` deltas
+    ups, downs = ups[:, period - 1:].copy(), downs[:, period - 1:].copy()
+    ups[:, 0] = np.clip(deltas[:, :period], 0, None).mean(axis=1)
+    downs[:, 0] = np.clip(-deltas[:, :period], 0, None).mean(axis=1)
+    avg_up = _ewm(ups, alpha=1. / period)
+    avg_down = _ewm(downs, alpha=1. / period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        valores = 100. - 100. / (1. + avg_up / avg_down)
+    valores = np.where(avg_down == 0, np.where(avg_up > 0, 100., 50.), valores)
+    rsi[:, period:] = valores
+    return rsi
+
+def indicadores_batch(prices, macd_fast=12, macd_slow=26, macd_signal=9, ema_curta=9, ema_longa=21, rsi_period=14):
+    prices = np.atleast_2d(np.asarray(prices, dtype=float))
+    macd_line, signal_line, hist = MACD_batch(prices, macd_fast, macd_slow, macd_signal)
+    return {
+        "macd": macd_line,
+        "signal": signal_line,
+        "hist": hist,
+        "ema_curta": EMA_batch(prices, ema_curta),
+        "ema_longa": EMA_batch(prices, ema_longa),
+        "rsi": RSI_batch(prices, rsi_period),
+    }
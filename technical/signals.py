@@ -0,0 +1,61 @@
+import numpy as np
+
+from technical.indicators import EMAState, MACDState, RSIState, indicadores_batch
+
+# Regras de entrada/saída das estratégias em forma vetorizada: `closes` é uma matriz
+# (n_símbolos x n_candles) e cada função devolve matrizes booleanas (compra, venda) do mesmo formato.
+# A coluna i é o sinal avaliado no fechamento do candle i, como no motor ao vivo.
+
+
+def cruzou_para_cima(a, b):
+    out = np.zeros(a.shape, dtype=bool)
+    out[:, 1:] = (a[:, :-1] < b[:, :-1]) & (a[:, 1:] > b[:, 1:])
+    return out
+
+
+def cruzou_para_baixo(a, b):
+    out = np.zeros(a.shape, dtype=bool)
+    out[:, 1:] = (a[:, :-1] > b[:, :-1]) & (a[:, 1:] < b[:, 1:])
+    return out
+
+
+def sinais_macd(closes, macd_fast=12, macd_slow=26, macd_signal=9, usar_ema_cross=True, ind=None):
+    # main.py / engine.py: cruzamento MACD x Signal ou EMA9 x EMA21
+    ind = ind or indicadores_batch(closes, macd_fast, macd_slow, macd_signal, 9, 21)
+    compra = cruzou_para_cima(ind["macd"], ind["signal"])
+    venda = cruzou_para_baixo(ind["macd"], ind["signal"])
+    if usar_ema_cross:
+        compra |= cruzou_para_cima(ind["ema_curta"], ind["ema_longa"])
+        venda |= cruzou_para_baixo(ind["ema_curta"], ind["ema_longa"])
+    return compra, venda
+
+
+def regra_indicadores(rsi, ema_curta, ema_longa, macd, signal, rsi_entrada=30, rsi_saida=70, macd_confirma=True):
+    # main1.py: RSI nos limites com EMA curta/longa alinhadas, MACD opcional como confirmação
+    # (vale para matrizes e para os valores de um candle só)
+    compra = (rsi < rsi_entrada) & (ema_curta > ema_longa)
+    venda = (rsi > rsi_saida) & (ema_curta < ema_longa)
+    if macd_confirma:
+        compra &= macd > signal
+        venda &= macd < signal
+    return compra, venda
+
+
+def sinais_indicadores(closes, rsi_entrada=30, rsi_saida=70, ema_curto=9, ema_longo=21, macd_confirma=True, ind=None):
+    ind = ind or indicadores_batch(closes, 12, 26, 9, ema_curto, ema_longo)
+    return regra_indicadores(ind["rsi"], ind["ema_curta"], ind["ema_longa"], ind["macd"], ind["signal"],
+                             rsi_entrada, rsi_saida, macd_confirma)
+
+
+def sinal_indicadores(closes, rsi_entrada=30, rsi_saida=70, ema_curto=9, ema_longo=21, macd_confirma=True):
+    # Um símbolo só (main1.py): (compra, venda) no último candle de `closes`. Os estados incrementais num laço
+    # custam menos que montar os DataFrames do lote para uma linha de 100 candles.
+    macd, curta, longa, rsi = MACDState(), EMAState(ema_curto), EMAState(ema_longo), RSIState(14)
+    for close in np.asarray(closes, dtype=float).tolist():
+        macd.update(close)
+        curta.update(close)
+        longa.update(close)
+        rsi.update(close)
+    linha_macd, signal, _ = macd.value
+    return regra_indicadores(np.nan if rsi.value is None else rsi.value, curta.value, longa.value, linha_macd, signal,
+                             rsi_entrada, rsi_saida, macd_confirma)
@@ -1,12 +1,12 @@
-from binance.client import Client
 import os
 from dotenv import load_dotenv
+from market.simulator import criar_client
 
 load_dotenv()
 API_KEY = os.getenv("BINANCE_API_KEY")
 API_SECRET = os.getenv("BINANCE_API_SECRET")
 
-client = Client(API_KEY, API_SECRET)
+client = criar_client(API_KEY, API_SECRET)
 try:
     print(client.get_account())
 except Exception as e:
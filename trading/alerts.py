@@ -0,0 +1,120 @@
+import logging
+import queue
+import random
+import threading
+import time
+from datetime import datetime
+
+log = logging.getLogger("alertas")
+
+# Limite de caracteres de uma mensagem do Twilio (SMS/WhatsApp)
+MAX_CARACTERES = 1600
+
+
+def twilio_sink(twilio, origem, destino):
+    def enviar(texto):
+        twilio.messages.create(body=texto, from_=origem, to=destino)
+    return enviar
+
+
+class LocalSink:
+    # Destino local (sem rede): guarda as mensagens em memória e, opcionalmente, num arquivo
+    def __init__(self, path=None):
+        self.path = path
+        self.mensagens = []
+
+    def __call__(self, texto):
+        self.mensagens.append(texto)
+        if self.path:
+            with open(self.path, "a") as f:
+                f.write(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]\n{texto}\n\n")
+
+
+def juntar(mensagens, limite=MAX_CARACTERES):
+    # Uma rajada de alertas vira um resumo; quebra em várias mensagens se passar do limite
+    if len(mensagens) == 1:
+        return [mensagens[0][:limite]]
+    partes, atual = [], f"{len(mensagens)} alertas:"
+    for mensagem in mensagens:
+        linha = f"\n{mensagem}"
+        if len(atual) + len(linha) > limite:
+            partes.append(atual)
+            atual = linha.lstrip("\n")
+        else:
+            atual += linha
+    partes.append(atual)
+    return partes
+
+
+class AlertDispatcher:
+    # Fila de alertas enviada por uma thread própria: quem opera só enfileira e segue.
+    # Alertas que chegam dentro de `janela` segundos do primeiro saem num único resumo;
+    # falhas do destino são repetidas com backoff exponencial até `max_tentativas`.
+    def __init__(self, sink, janela=5.0, max_tentativas=5, backoff=2.0, backoff_max=60.0, max_fila=1000):
+        self.sink = sink
+        self.janela = janela
+        self.max_tentativas = max_tentativas
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.fila = queue.Queue(maxsize=max_fila)
+        self.enviadas = 0
+        self.descartadas = 0
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="alertas", daemon=True)
+        self._thread.start()
+
+    def alerta(self, mensagem):
+        try:
+            self.fila.put_nowait(mensagem)
+        except queue.Full:
+            self.descartadas += 1
+            log.warning(f"Fila de alertas cheia; alerta descartado: {mensagem}")
+
+    def _coletar(self):
+        try:
+            mensagens = [self.fila.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        limite = time.monotonic() + self.janela
+        while True:
+            restante = limite - time.monotonic()
+            if restante <= 0 or self._parar.is_set():
+                break
+            try:
+                mensagens.append(self.fila.get(timeout=restante))
+            except queue.Empty:
+                break
+        # Ao parar, o que ainda está na fila vai no mesmo resumo
+        while self._parar.is_set():
+            try:
+                mensagens.append(self.fila.get_nowait())
+            except queue.Empty:
+                break
+        return mensagens
+
+    def _enviar(self, texto):
+        for tentativa in range(1, self.max_tentativas + 1):
+            try:
+                self.sink(texto)
+                self.enviadas += 1
+                return True
+            except Exception as e:
+                if tentativa == self.max_tentativas or self._parar.is_set():
+                    log.warning(f"Falha ao enviar alerta ({tentativa} tentativas): {e}")
+                    break
+                espera = min(self.backoff * 2 ** (tentativa - 1), self.backoff_max)
+                log.warning(f"Falha ao enviar alerta: {e}; nova tentativa em {espera:.0f}s")
+                self._parar.wait(espera * random.uniform(0.8, 1.2))
+        self.descartadas += 1
+        return False
+
+    def _run(self):
+        while not (self._parar.is_set() and self.fila.empty()):
+            mensagens = self._coletar()
+            for texto in juntar(mensagens) if mensagens else []:
+                self._enviar(texto)
+
+    def stop(self, timeout=10):
+        # Esvazia a fila (uma tentativa por mensagem) e encerra a thread
+        self._parar.set()
+        self._thread.join(timeout)
@@ -0,0 +1,148 @@
+import json
+import os
+import threading
+from collections import deque
+
+from trading.strategies import CONTA_PRINCIPAL
+
+# Formato do ledger.json; snapshots de outra versão são refeitos a partir do TradeStore
+VERSAO = 2
+
+
+class Ledger:
+    # Posições por lote (FIFO ou custo médio) e P&L realizado, atualizados operação a operação.
+    # Os agregados diários e totais ficam prontos: o painel só lê, sem reprocessar o histórico.
+    # As taxas (em USDT) entram no custo do lote na compra e saem do valor recebido na venda.
+    # Lotes por (conta, symbol): a venda de uma conta só consome as compras da mesma conta.
+    def __init__(self, metodo="fifo", max_fechamentos=1000):
+        self.metodo = metodo
+        self.max_fechamentos = max_fechamentos
+        self.lotes = {}
+        self.fechamentos = deque(maxlen=max_fechamentos)
+        self.diario = {}
+        self.totais = {"realizado": 0.0, "compras": 0.0, "vendas": 0.0, "taxas": 0.0, "fluxo": 0.0, "operacoes": 0}
+        self.ultimo_id = 0
+        self._lock = threading.Lock()
+
+    def _dia(self, horario):
+        dia = horario[:10]
+        if dia not in self.diario:
+            self.diario[dia] = {"realizado": 0.0, "compras": 0.0, "vendas": 0.0, "fluxo": 0.0, "fluxo_acumulado": self.totais["fluxo"]}
+        return self.diario[dia]
+
+    def aplicar(self, horario, symbol, tipo, preco, qtd, taxa=0.0, id=None, conta=CONTA_PRINCIPAL):
+        horario = str(horario)[:19]
+        dia = self._dia(horario)
+        valor = preco * qtd
+        lotes = self.lotes.setdefault((conta, symbol), deque())
+        if tipo == "COMPRA":
+            custo_unitario = (valor + taxa) / qtd if qtd else preco
+            if self.metodo == "medio" and lotes:
+                lote = lotes[0]
+                total = lote["qtd"] + qtd
+                lote["custo"] = (lote["qtd"] * lote["custo"] + qtd * custo_unitario) / total
+                lote["preco"] = (lote["qtd"] * lote["preco"] + valor) / total
+                lote["qtd"] = total
+            else:
+                lotes.append({"horario": horario, "preco": preco, "custo": custo_unitario, "qtd": qtd})
+            dia["compras"] += valor
+            self.totais["compras"] += valor
+            fluxo = -valor
+        else:
+            restante = qtd
+            receita_unitaria = (valor - taxa) / qtd if qtd else preco
+            lucro_total = 0.0
+            # Venda parcial consome os lotes mais antigos; sobra sem lote (saldo de fora do robô) não gera P&L
+            while restante > 1e-12 and lotes:
+                lote = lotes[0]
+                usado = min(restante, lote["qtd"])
+                lucro = (receita_unitaria - lote["custo"]) * usado
+                lucro_total += lucro
+                self.fechamentos.append({
+                    "Moeda": symbol,
+                    "Conta": conta,
+                    "Data Compra": lote["horario"],
+                    "Preço Compra": lote["preco"],
+                    "Data Venda": horario,
+                    "Preço Venda": preco,
+                    "Quantidade": usado,
+                    "Lucro/Prejuízo": lucro,
+                })
+                lote["qtd"] -= usado
+                restante -= usado
+                if lote["qtd"] <= 1e-12:
+                    lotes.popleft()
+            dia["realizado"] += lucro_total
+            dia["vendas"] += valor
+            self.totais["realizado"] += lucro_total
+            self.totais["vendas"] += valor
+            fluxo = valor
+        dia["fluxo"] += fluxo
+        self.totais["fluxo"] += fluxo
+        dia["fluxo_acumulado"] = self.totais["fluxo"]
+        self.totais["taxas"] += taxa
+        self.totais["operacoes"] += 1
+        if id is not None:
+            self.ultimo_id = max(self.ultimo_id, int(id))
+
+    def sincronizar(self, trade_store):
+        # Só as operações gravadas depois da última aplicada
+        with self._lock:
+            novas = trade_store.consultar(depois_de_id=self.ultimo_id)
+            for row in novas.sort_values("id").itertuples(index=False):
+                self.aplicar(row.horario, row.symbol, row.tipo, row.preco, row.qtd, row.taxa, row.id, row.conta)
+            return len(novas)
+
+    def posicoes(self):
+        # {(conta, symbol): {"qtd", "custo_medio"}}
+        resultado = {}
+        for chave, lotes in self.lotes.items():
+            qtd = sum(l["qtd"] for l in lotes)
+            if qtd > 1e-12:
+                resultado[chave] = {"qtd": qtd, "custo_medio": sum(l["qtd"] * l["custo"] for l in lotes) / qtd}
+        return resultado
+
+    def snapshot(self):
+        return {
+            "versao": VERSAO,
+            "metodo": self.metodo,
+            "max_fechamentos": self.max_fechamentos,
+            "lotes": [[conta, symbol, list(l)] for (conta, symbol), l in self.lotes.items()],
+            "fechamentos": list(self.fechamentos),
+            "diario": self.diario,
+            "totais": self.totais,
+            "ultimo_id": self.ultimo_id,
+        }
+
+    @classmethod
+    def restore(cls, snap):
+        ledger = cls(snap["metodo"], snap["max_fechamentos"])
+        ledger.lotes = {(conta, symbol): deque(l) for conta, symbol, l in snap["lotes"]}
+        ledger.fechamentos.extend(snap["fechamentos"])
+        ledger.diario = snap["diario"]
+        ledger.totais = snap["totais"]
+        ledger.ultimo_id = snap["ultimo_id"]
+        return ledger
+
+    def salvar(self, path):
+        with self._lock:
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp, path)
+
+
+def abrir_ledger(trade_store, path="ledger.json", metodo="fifo"):
+    # Parte do snapshot salvo (se for do mesmo método) e aplica só as operações novas
+    ledger = None
+    try:
+        with open(path) as f:
+            snap = json.load(f)
+        if snap.get("versao") == VERSAO and snap["metodo"] == metodo:
+            ledger = Ledger.restore(snap)
+    except (OSError, ValueError, KeyError):
+        pass
+    ledger = ledger or Ledger(metodo)
+    if ledger.sincronizar(trade_store):
+        ledger.salvar(path)
+    return ledger
@@ -0,0 +1,106 @@
+CONTA_PRINCIPAL = "principal"
+
+
+class Estrategia:
+    # Plugin de estratégia do motor: declara os indicadores que usa e decide compra/venda a partir dos
+    # valores (anterior, atual) que o motor calcula no IndicatorCache compartilhado.
+    # `conta` escolhe as credenciais das ordens; os dados de mercado são os mesmos para todas as contas.
+    tipo = None
+    PADROES = {}
+
+    def __init__(self, nome, symbols, intervalo, conta=CONTA_PRINCIPAL, params=None, timeframes=(), trading_ativo=True):
+        self.nome = nome
+        self.symbols = list(symbols)
+        self.intervalo = intervalo
+        self.conta = conta
+        self.params = {**self.PADROES, **(params or {})}
+        self.timeframes = list(timeframes)
+        self.trading_ativo = trading_ativo
+
+    def indicadores(self):
+        return []
+
+    def tendencia(self):
+        # Indicador dos timeframes de confirmação: MACD acima/abaixo da signal na última barra fechada
+        p = self.params
+        return ("macd", p.get("macd_fast", 12), p.get("macd_slow", 26), p.get("macd_signal", 9))
+
+    def avaliar(self, valores):
+        # valores: {indicador: (anterior, atual)} -> (compra, venda, dados para o estado publicado)
+        raise NotImplementedError
+
+
+class EstrategiaMACD(Estrategia):
+    # Cruzamento MACD x Signal ou EMA9 x EMA21 (a estratégia do painel, main.py)
+    tipo = "macd"
+    PADROES = {"macd_fast": 12, "macd_slow": 26, "macd_signal": 9, "usar_ema_cross": True}
+
+    def indicadores(self):
+        return [self.tendencia(), ("ema", 9), ("ema", 21), ("rsi", 14)]
+
+    def avaliar(self, valores):
+        (macd_ant, signal_ant, _), (macd, signal, _) = valores[self.tendencia()]
+        curta_ant, curta = valores[("ema", 9)]
+        longa_ant, longa = valores[("ema", 21)]
+        compra = macd_ant < signal_ant and macd > signal
+        venda = macd_ant > signal_ant and macd < signal
+        if self.params["usar_ema_cross"]:
+            compra = compra or (curta_ant < longa_ant and curta > longa)
+            venda = venda or (curta_ant > longa_ant and curta < longa)
+        return compra, venda, {"macd": macd, "signal": signal, "ema9": curta, "ema21": longa, "rsi": valores[("rsi", 14)][1]}
+
+
+class EstrategiaRSI(Estrategia):
+    # RSI nos limites com EMA curta/longa alinhadas, MACD opcional como confirmação (a regra do main1.py)
+    tipo = "rsi_ema"
+    PADROES = {"rsi_entrada": 30, "rsi_saida": 70, "ema_curto": 9, "ema_longo": 21, "macd_confirma": True}
+
+    def indicadores(self):
+        return [("rsi", 14), ("ema", self.params["ema_curto"]), ("ema", self.params["ema_longo"]), self.tendencia()]
+
+    def avaliar(self, valores):
+        p = self.params
+        rsi = valores[("rsi", 14)][1]
+        curta = valores[("ema", p["ema_curto"])][1]
+        longa = valores[("ema", p["ema_longo"])][1]
+        macd, signal, _ = valores[self.tendencia()][1]
+        if rsi is None:
+            return False, False, {"rsi": None}
+        compra = rsi < p["rsi_entrada"] and curta > longa
+        venda = rsi > p["rsi_saida"] and curta < longa
+        if p["macd_confirma"]:
+            compra = compra and macd > signal
+            venda = venda and macd < signal
+        return compra, venda, {"rsi": rsi, "ema_curta": curta, "ema_longa": longa, "macd": macd, "signal": signal}
+
+
+ESTRATEGIAS = {cls.tipo: cls for cls in (EstrategiaMACD, EstrategiaRSI)}
+
+
+def criar_estrategias(cfg):
+    # A estratégia do painel vem das chaves do topo da config (sem símbolos, fica desligada);
+    # "estrategias" acrescenta outras, cada uma com tipo, símbolos, intervalo, conta e parâmetros próprios:
+    #   {"nome": "rsi_eth", "tipo": "rsi_ema", "symbols": ["ETHUSDT"], "intervalo": "1h", "conta": "b",
+    #    "params": {"rsi_entrada": 25}, "timeframes": ["4h"]}
+    estrategias = []
+    if cfg["symbols"]:
+        estrategias.append(EstrategiaMACD("macd", cfg["symbols"], cfg["intervalo"], timeframes=cfg["timeframes"],
+                                          params={k: cfg[k] for k in EstrategiaMACD.PADROES}))
+    for d in cfg.get("estrategias", []):
+        tipo = d.get("tipo", "macd")
+        if tipo not in ESTRATEGIAS:
+            raise ValueError(f"Tipo de estratégia desconhecido: {tipo}")
+        estrategias.append(ESTRATEGIAS[tipo](
+            d.get("nome", tipo), d["symbols"], d.get("intervalo", cfg["intervalo"]), d.get("conta", CONTA_PRINCIPAL),
+            d.get("params"), d.get("timeframes", ()), d.get("trading_ativo", True)))
+    nomes = [e.nome for e in estrategias]
+    if len(set(nomes)) != len(nomes):
+        raise ValueError(f"Nomes de estratégia repetidos: {nomes}")
+    # A venda zera o saldo do ativo na conta: duas estratégias no mesmo (conta, symbol) venderiam a posição uma da outra
+    donos = {}
+    for e in estrategias:
+        for symbol in e.symbols:
+            outra = donos.setdefault((e.conta, symbol), e.nome)
+            if outra != e.nome:
+                raise ValueError(f"{symbol} na conta {e.conta} já é operado pela estratégia {outra} (use outra conta para {e.nome})")
+    return estrategias
@@ -0,0 +1,205 @@
+import calendar
+import csv
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from trading.strategies import CONTA_PRINCIPAL
+
+SCHEMA_VERSION = 2
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS operacoes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts INTEGER NOT NULL,
+        symbol TEXT NOT NULL,
+        tipo TEXT NOT NULL CHECK (tipo IN ('COMPRA', 'VENDA')),
+        preco REAL NOT NULL,
+        qtd REAL NOT NULL,
+        taxa REAL NOT NULL DEFAULT 0,
+        estrategia TEXT,
+        params TEXT,
+        conta TEXT NOT NULL DEFAULT 'principal'
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_operacoes_ts ON operacoes (ts)",
+    "CREATE INDEX IF NOT EXISTS idx_operacoes_symbol_ts ON operacoes (symbol, ts)",
+]
+
+# Passos para abrir bancos de versões anteriores: versão -> comandos que levam a ela
+MIGRACOES = {
+    2: ["ALTER TABLE operacoes ADD COLUMN conta TEXT NOT NULL DEFAULT 'principal'"],
+}
+
+COLUNAS = ["id", "horario", "symbol", "tipo", "preco", "qtd", "taxa", "estrategia", "params", "conta"]
+
+# Colunas extras das linhas antigas do operacoes_log.csv (main.py grava 8 colunas, main1.py 10)
+PARAMS_CSV = {
+    8: ("macd", ["macd_fast", "macd_slow", "macd_signal"]),
+    10: ("rsi_ema", ["rsi_entrada", "rsi_saida", "ema_curto", "ema_longo", "macd_confirma"]),
+}
+
+
+def execucao(ordem, base_asset, preco_em_usdt, quote="USDT"):
+    # (preço médio, quantidade, taxa em USDT) da resposta de uma ordem a mercado (newOrderRespType FULL).
+    # Comissão cobrada no próprio ativo sai da quantidade: preço * qtd líquida + taxa = o que foi pago.
+    # `preco_em_usdt(ativo)` converte comissões em outro ativo (ex.: BNB).
+    qtd = float(ordem["executedQty"])
+    preco = float(ordem["cummulativeQuoteQty"]) / qtd if qtd else 0.0
+    taxa = 0.0
+    for fill in ordem.get("fills", []):
+        comissao = float(fill["commission"])
+        if fill["commissionAsset"] == quote:
+            taxa += comissao
+        elif fill["commissionAsset"] == base_asset:
+            taxa += comissao * float(fill["price"])
+            if ordem.get("side", "BUY") == "BUY":
+                qtd -= comissao
+        else:
+            taxa += comissao * preco_em_usdt(fill["commissionAsset"])
+    return preco, qtd, taxa
+
+
+def _valor_csv(texto):
+    # Parâmetros do CSV antigo com o tipo das linhas novas: "12" -> 12, "0.5" -> 0.5, "True" -> True
+    texto = texto.strip()
+    if texto in ("True", "False"):
+        return texto == "True"
+    for tipo in (int, float):
+        try:
+            return tipo(texto)
+        except ValueError:
+            pass
+    return texto
+
+
+def _ts(horario):
+    # Segundos do horário local de parede (como gravado no CSV); pd.to_datetime(unit="s") devolve o mesmo horário
+    if isinstance(horario, (int, float)):
+        return int(horario)
+    if isinstance(horario, str):
+        horario = datetime.strptime(horario, "%Y-%m-%d %H:%M:%S")
+    return calendar.timegm(horario.timetuple())
+
+
+class TradeStore:
+    # Histórico de operações em SQLite (WAL): inserções atômicas mesmo com vários processos
+    # gravando, e consultas por período/símbolo pelos índices em vez de ler o arquivo inteiro.
+    def __init__(self, path="operacoes.db"):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            versao = conn.execute("PRAGMA user_version").fetchone()[0]
+            if versao > SCHEMA_VERSION:
+                raise RuntimeError(f"{path} usa o esquema {versao}, mais novo que o suportado ({SCHEMA_VERSION}).")
+            # versão 0 = banco novo, criado já no esquema atual
+            for passo in range(versao + 1, SCHEMA_VERSION + 1) if versao else ():
+                for sql in MIGRACOES[passo]:
+                    conn.execute(sql)
+            for sql in SCHEMA:
+                conn.execute(sql)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = _Transacao(conn)
+            conn = self._local.conn
+        return conn
+
+    def registrar(self, horario, symbol, tipo, preco, qtd, taxa=0.0, estrategia=None, params=None, conta=CONTA_PRINCIPAL):
+        with self._conn() as conn:
+            cur = conn.execute(
+                "INSERT INTO operacoes (ts, symbol, tipo, preco, qtd, taxa, estrategia, params, conta) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (_ts(horario), symbol, tipo, float(preco), float(qtd), float(taxa), estrategia,
+                 json.dumps(params) if params is not None else None, conta),
+            )
+            return cur.lastrowid
+
+    def consultar(self, inicio=None, fim=None, symbol=None, depois_de_id=None, limite=None, decrescente=False):
+        filtros, args = [], []
+        if inicio is not None:
+            filtros.append("ts >= ?")
+            args.append(_ts(inicio))
+        if fim is not None:
+            filtros.append("ts < ?")
+            args.append(_ts(fim))
+        if symbol is not None:
+            filtros.append("symbol = ?")
+            args.append(symbol)
+        if depois_de_id is not None:
+            filtros.append("id > ?")
+            args.append(depois_de_id)
+        sql = "SELECT id, ts, symbol, tipo, preco, qtd, taxa, estrategia, params, conta FROM operacoes"
+        if filtros:
+            sql += " WHERE " + " AND ".join(filtros)
+        sql += f" ORDER BY ts {'DESC' if decrescente else 'ASC'}, id {'DESC' if decrescente else 'ASC'}"
+        if limite is not None:
+            sql += " LIMIT ?"
+            args.append(int(limite))
+        df = pd.DataFrame(self._conn().execute(sql, args).fetchall(), columns=COLUNAS)
+        df["horario"] = pd.to_datetime(df["horario"], unit="s")
+        return df
+
+    def contar(self):
+        return self._conn().execute("SELECT COUNT(*) FROM operacoes").fetchone()[0]
+
+    def importar_csv(self, path, se_vazio=False):
+        # Migração do operacoes_log.csv: ignora cabeçalho e linhas com horário, números ou tipo inválidos
+        # (uma linha recusada pelo CHECK desfaria a importação inteira)
+        linhas = []
+        with open(path, newline="") as f:
+            for row in csv.reader(f):
+                try:
+                    ts = _ts(row[0])
+                    preco, qtd = float(row[3]), float(row[4])
+                except (ValueError, IndexError):
+                    continue
+                if row[2] not in ("COMPRA", "VENDA"):
+                    continue
+                estrategia, nomes = PARAMS_CSV.get(len(row), (None, []))
+                params = {nome: _valor_csv(valor) for nome, valor in zip(nomes, row[5:])} if nomes else None
+                linhas.append((ts, row[1], row[2], preco, qtd, 0.0, estrategia, json.dumps(params) if params else None))
+        with self._conn() as conn:
+            if se_vazio and conn.execute("SELECT COUNT(*) FROM operacoes").fetchone()[0]:
+                return 0
+            conn.executemany(
+                "INSERT INTO operacoes (ts, symbol, tipo, preco, qtd, taxa, estrategia, params) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                linhas,
+            )
+        return len(linhas)
+
+
+class _Transacao:
+    # `with conn:` abre BEGIN IMMEDIATE (trava de escrita já no início) e faz commit/rollback no fim
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, *args):
+        return self.conn.execute(*args)
+
+    def executemany(self, *args):
+        return self.conn.executemany(*args)
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self
+
+    def __exit__(self, tipo, *_):
+        self.conn.execute("ROLLBACK" if tipo else "COMMIT")
+        return False
+
+
+def abrir_trade_store(path="operacoes.db", csv_legado="operacoes_log.csv"):
+    # Na primeira abertura importa o CSV antigo, se existir
+    novo = not os.path.exists(path)
+    store = TradeStore(path)
+    if novo and csv_legado and os.path.exists(csv_legado):
+        store.importar_csv(csv_legado, se_vazio=True)
+    return store